@@ -0,0 +1,124 @@
+import argparse
+import cProfile
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
+from main import setup_logging, add_analysis_arguments, profile_directory, open_run_history, prepare_module_analysis, run_module_analyses
+from utils.cache_utils import ResultCache
+from solver import Budget, init_worker
+
+def read_manifest(path, default_rules):
+    """Read a manifest with one `module [rules]` entry per line, relative paths are resolved against the manifest directory."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            module = os.path.join(base_dir, fields[0])
+            rules = os.path.join(base_dir, fields[1]) if len(fields) > 1 else default_rules
+            if rules is None:
+                raise Exception(f"No rule file for {fields[0]} in {path} and no --rules given")
+            entries.append((module, rules))
+    return entries
+
+def find_modules(directory, rules):
+    """Return a (module, rules) entry for every .wasm file under the directory."""
+    if rules is None:
+        raise Exception("--rules is required when analyzing a directory")
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(".wasm"):
+                entries.append((os.path.join(root, name), rules))
+    return sorted(entries)
+
+def module_output_dirs(entries, output_dir):
+    """Assign each module its own output directory, /output/<module>/, disambiguating modules with the same name."""
+    output_dirs = []
+    used = set()
+    for module, _ in entries:
+        name = os.path.splitext(os.path.basename(module))[0]
+        unique_name = name
+        suffix = 1
+        while unique_name in used:
+            unique_name = f"{name}_{suffix}"
+            suffix += 1
+        used.add(unique_name)
+        output_dirs.append(os.path.join(output_dir, unique_name))
+    return output_dirs
+
+def prepared_analyses(prepare, items, lookahead):
+    """Yield the prepared analysis of every item, skipping the None ones, with the next lookahead items prepared ahead in a thread pool."""
+    # NOTE: the wassail front ends are subprocesses, run them for several modules at once,
+    # but only a few modules ahead so that the analyses waiting for the pool stay bounded
+    with ThreadPoolExecutor(max_workers=lookahead) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(prepare, item))
+            if len(pending) > lookahead:
+                analysis = pending.popleft().result()
+                if analysis is not None:
+                    yield analysis
+        while pending:
+            analysis = pending.popleft().result()
+            if analysis is not None:
+                yield analysis
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a corpus of WASM modules sharing one worker pool")
+    parser.add_argument("inputs", help="Directory containing the .wasm modules, or manifest file with one `module [rules]` entry per line")
+    parser.add_argument("--rules", help="Path of the file containing the rules, used for the modules without their own rule file")
+    parser.add_argument("--max-modules", type=int, help="Number of modules analyzed at once, the next one starts when one finishes (default: twice the jobs)")
+    add_analysis_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.debug)
+
+    args.jobs = min(cpu_count(), args.jobs)
+    max_modules = args.max_modules if args.max_modules is not None else 2 * args.jobs
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    budget = Budget(args.timeout, args.max_states, args.max_instructions)
+
+    if os.path.isdir(args.inputs):
+        entries = find_modules(args.inputs, args.rules)
+    else:
+        entries = read_manifest(args.inputs, args.rules)
+    output_dirs = module_output_dirs(entries, args.output_dir)
+    logging.info(f"batch of {len(entries)} modules")
+
+    profile_dir = profile_directory(args)
+    history = open_run_history(args)
+    profiler = None
+    if profile_dir is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def prepare(entry):
+        (module, rules), output_dir = entry
+        try:
+            return prepare_module_analysis(rules, module, output_dir, args, cache, budget, profile_dir, history)
+        except Exception as e:
+            logging.error(f"skipping {module}: {e}")
+            return None
+
+    # NOTE: a single long-lived pool serves every module, workers load the modules lazily and keep the most recent ones resident,
+    # modules are prepared and analyzed in a sliding window so that a corpus of any size holds a bounded number of them
+    with Pool(processes=args.jobs, initializer=init_worker, initargs=(None, budget)) as pool:
+        analyses = prepared_analyses(prepare, zip(entries, output_dirs), args.jobs)
+        run_module_analyses(pool, analyses, args, history, max_modules)
+
+    if history is not None:
+        history.save()
+
+    if cache is not None:
+        cache.evict()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, "parent.prof"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compare the cartesian-product match sequencing with the offset-indexed enumerator on synthetic match sets.
+
+Run from the repository root:
+    python -m benchmarks.bench_match_sequences --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from utils.rule_parser_lark import Rule, RuleMatch
+from utils.collections_utils import generate_ordered_valid_combinations, generate_ordered_match_sequences, is_valid_rule_match_sequence
+
+def generate_rule_matches(matches_per_rule, rule_count, function_count, max_offset, seed):
+    """Build a synthetic rule_matches map with matches spread over function_count functions."""
+    rng = random.Random(seed)
+    rule_matches = defaultdict(list)
+    for rule_id in range(rule_count):
+        rule = Rule(f"rule{rule_id}", "i32.add", ["a", "b"], ["a>0"])
+        for _ in range(matches_per_rule):
+            rule_matches[rule_id].append(RuleMatch(rule, rng.randrange(function_count), rng.randrange(max_offset)))
+    return rule_matches
+
+def sequence_key(combo):
+    """Hashable identity of a match sequence."""
+    return tuple((key, id(rule_match)) for key, rule_match in combo.items())
+
+def measure(generator):
+    """Consume a generator and return (elapsed seconds, set of sequence keys)."""
+    start = time.perf_counter()
+    found = set(sequence_key(combo) for combo in generator)
+    return time.perf_counter() - start, found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark match sequence enumeration")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Matches per rule")
+    parser.add_argument("--rules", type=int, default=2, help="Number of rules in the sequence (default: 2)")
+    parser.add_argument("--functions", type=int, default=1000, help="Number of functions the matches are spread over (default: 1000)")
+    parser.add_argument("--max-offset", type=int, default=5000, help="Upper bound of the synthetic offsets (default: 5000)")
+    parser.add_argument("--max-product", type=float, default=1e7, help="Skip the cartesian-product generator above this many tuples (default: 1e7)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    key_order = list(range(args.rules))
+    print(f"{'matches/rule':>12} {'sequences':>10} {'product (s)':>12} {'indexed (s)':>12} {'speedup':>8}")
+    for size in args.sizes:
+        rule_matches = generate_rule_matches(size, args.rules, args.functions, args.max_offset, args.seed)
+        indexed_time, indexed = measure(generate_ordered_match_sequences(rule_matches, key_order))
+
+        product_size = float(size) ** args.rules
+        if product_size <= args.max_product:
+            product_time, reference = measure(generate_ordered_valid_combinations(rule_matches, is_valid_rule_match_sequence, key_order))
+            if reference != indexed:
+                raise Exception(f"Output mismatch for {size} matches per rule")
+            print(f"{size:>12} {len(indexed):>10} {product_time:>12.3f} {indexed_time:>12.3f} {product_time / indexed_time:>7.1f}x")
+        else:
+            print(f"{size:>12} {len(indexed):>10} {'skipped':>12} {indexed_time:>12.3f} {'-':>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Measure the per-task startup of run_symbolic_execution with and without the worker-resident module.
+
+Run from the repository root:
+    python -m benchmarks.bench_module_loading module.wasm --function 0 --repeat 20
+"""
+import argparse
+import pickle
+import statistics
+import time
+from manticore.wasm import ManticoreWASM
+from solver import Param, load_module, get_param_specs
+
+def cold_startup(module, function_index):
+    """Startup as done before worker-resident loading: parse the module and resolve the signature for every task."""
+    m = ManticoreWASM(module)
+    types = m.get_params_by_func_index(function_index)[0]
+    return [Param(f"param_{idx}", type.get_size()) for idx, type in enumerate(types)]
+
+def resident_startup(module, function_index):
+    """Startup with the module and the parameter specs already resident in the worker."""
+    m = ManticoreWASM(pickle.loads(load_module(module)))
+    return get_param_specs(m, module, function_index)
+
+def measure(startup, module, function_index, repeat):
+    """Return the per-task startup times in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        startup(module, function_index)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-task ManticoreWASM startup")
+    parser.add_argument("module", help="Path of the WASM module")
+    parser.add_argument("--function", type=int, default=0, help="Index of the function to prepare (default: 0)")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of simulated tasks (default: 20)")
+    args = parser.parse_args()
+
+    cold = measure(cold_startup, args.module, args.function, args.repeat)
+    # NOTE: the first call pays the one-off load, as the pool initializer would
+    load_start = time.perf_counter()
+    load_module(args.module)
+    load_time = time.perf_counter() - load_start
+    resident = measure(resident_startup, args.module, args.function, args.repeat)
+
+    print(f"one-off worker load:        {load_time * 1000:8.2f} ms")
+    print(f"cold startup per task:      {statistics.median(cold) * 1000:8.2f} ms (median of {args.repeat})")
+    print(f"resident startup per task:  {statistics.median(resident) * 1000:8.2f} ms (median of {args.repeat})")
+    print(f"saved per task:             {(statistics.median(cold) - statistics.median(resident)) * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Run the pipeline stages one at a time on synthetic modules and record their throughput and memory.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline --output results.json
+    python -m benchmarks.bench_pipeline --baseline baseline.json --tolerance 0.25
+
+Record the baseline in the Docker image, where Manticore is installed, see the README.
+
+The stages are rule parsing, match sequence enumeration, sub-callgraph construction and, when
+Manticore is installed, symbolic execution. The wassail front end is bypassed: the generator
+knows the matches, callgraph and exports of the modules it writes.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from utils.rule_parser_lark import parse_rule_file, RuleMatch
+from utils.collections_utils import generate_ordered_match_sequences
+from utils.dot_file_utils import build_target_subgraph
+from benchmarks.synthetic_wasm import generate_module, rule_file_content
+
+# NOTE: name -> (functions, depth, fanout, matches per function, loop nesting, rules in the sequence)
+SCENARIOS = {
+    "small": (50, 3, 2, 2, 1, 2),
+    "wide": (500, 3, 8, 2, 1, 2),
+    "deep": (500, 25, 2, 2, 1, 2),
+    "match_heavy": (100, 4, 2, 16, 1, 3),
+    "loop_heavy": (50, 3, 2, 2, 4, 2),
+}
+# NOTE: only throughput and memory of the same stage and scenario are compared with the baseline
+COMPARED_METRICS = ("items_per_second", "peak_memory_kb")
+# NOTE: the throughput of stages faster than this is mostly timer and scheduling noise, only their memory is compared
+MIN_COMPARED_SECONDS = 0.01
+# NOTE: stages shorter than a second per call vary more from run to run (caches, frequency scaling), they tolerate a larger change
+SHORT_STAGE_SECONDS = 1.0
+SHORT_STAGE_TOLERANCE = 0.4
+
+def measure(function, repeat):
+    """Return the median wall time per call of repeat timings and the peak traced memory of one more call."""
+    # NOTE: each timing runs enough calls to last at least 0.2s, so that sub-millisecond stages are measured reliably,
+    # the median is as stable as the baseline it is compared with, a lucky best timing is not
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    median = statistics.median(timer.repeat(repeat, number)) / number
+    # NOTE: tracing slows the allocations down, memory is measured in a separate call
+    tracemalloc.start()
+    items = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return median, items, peak // 1024
+
+def stage_record(seconds, items, peak_memory_kb):
+    return {
+        "seconds": seconds,
+        "items": items,
+        "items_per_second": items / seconds if seconds > 0 else None,
+        "peak_memory_kb": peak_memory_kb,
+    }
+
+def rule_matches_of(module, rule_set):
+    """The rule matches the wassail front end would report for a synthetic module."""
+    rule_matches = {}
+    for rule_id, rule in enumerate(rule_set.rules):
+        rule_matches[rule_id] = [RuleMatch(rule, fidx, offset) for fidx, offsets in module.add_offsets.items() for offset in offsets]
+    return rule_matches
+
+def run_symbolic_stage(module_path, sequences, limit):
+    """Symbolic execution of the first match sequences, skipped if Manticore is not installed."""
+    try:
+        from solver import InstructionHookPlugin, load_module, run_symbolic_execution
+    except ImportError as e:
+        return {"skipped": str(e)}
+    load_module(module_path)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    states = 0
+    for fidx, sequence in sequences[:limit]:
+        result = run_symbolic_execution(module_path, fidx, InstructionHookPlugin(sequence))
+        states += result.metrics.get("states", 0)
+    seconds = time.perf_counter() - start
+    record = stage_record(seconds, min(limit, len(sequences)), None)
+    record["states"] = states
+    record["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    record["rss_growth_kb"] = record["peak_rss_kb"] - rss_before
+    return record
+
+def run_scenario(name, parameters, repeat, symbolic_limit, work_dir):
+    """Generate the module of a scenario and run every stage on it."""
+    functions, depth, fanout, matches, loops, rules = parameters
+    module = generate_module(functions, depth, fanout, matches, loops)
+    module_path = os.path.join(work_dir, f"{name}.wasm")
+    rule_path = os.path.join(work_dir, f"{name}.rule")
+    with open(module_path, "wb") as f:
+        f.write(module.binary)
+    with open(rule_path, "w") as f:
+        f.write(rule_file_content(rules))
+
+    stages = {}
+    seconds, _, memory = measure(lambda: parse_rule_file(rule_path), repeat)
+    stages["parse_rule_file"] = stage_record(seconds, rules, memory)
+
+    rule_set = parse_rule_file(rule_path)
+    rule_matches = rule_matches_of(module, rule_set)
+    key_order = rule_set.application_order
+    seconds, count, memory = measure(lambda: sum(1 for _ in generate_ordered_match_sequences(rule_matches, key_order)), repeat)
+    stages["generate_ordered_match_sequences"] = stage_record(seconds, count, memory)
+
+    targets = sorted(module.add_offsets)
+    seconds, _, memory = measure(lambda: [build_target_subgraph(module.callgraph_edges, f"node{fidx}", module.exported) for fidx in targets], repeat)
+    stages["build_target_subgraph"] = stage_record(seconds, len(targets), memory)
+
+    sequences = []
+    for combo in generate_ordered_match_sequences(rule_matches, key_order):
+        sequence = list(combo.values())
+        sequences.append((sequence[0].fidx, sequence))
+    stages["run_symbolic_execution"] = run_symbolic_stage(module_path, sequences, symbolic_limit)
+
+    return {
+        "parameters": dict(zip(("functions", "depth", "fanout", "matches", "loops", "rules"), parameters)),
+        "module_size": len(module.binary),
+        "stages": stages,
+    }
+
+def stage_tolerance(reference, tolerance):
+    """Relative change tolerated for a stage, given its baseline record."""
+    if reference.get("seconds", 0) < SHORT_STAGE_SECONDS:
+        return max(tolerance, SHORT_STAGE_TOLERANCE)
+    return tolerance
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against baseline, (scenario, stage, metric) -> description: lower throughput or higher memory beyond the tolerance of the stage."""
+    regressions = {}
+    for scenario, scenario_results in results["scenarios"].items():
+        baseline_stages = baseline["scenarios"].get(scenario, {}).get("stages", {})
+        for stage, record in scenario_results["stages"].items():
+            reference = baseline_stages.get(stage, {})
+            for metric in COMPARED_METRICS:
+                value, expected = record.get(metric), reference.get(metric)
+                if value is None or not expected:
+                    continue
+                if metric == "items_per_second" and reference.get("seconds", 0) < MIN_COMPARED_SECONDS:
+                    continue
+                change = (value - expected) / expected
+                limit = stage_tolerance(reference, tolerance)
+                # NOTE: throughput regresses when it drops, memory when it grows
+                if (metric == "items_per_second" and change < -limit) or (metric == "peak_memory_kb" and change > limit):
+                    regressions[(scenario, stage, metric)] = f"{scenario}/{stage} {metric}: {expected:.1f} -> {value:.1f} ({change:+.0%})"
+    return regressions
+
+def confirm_regressions(regressions, baseline, args):
+    """Rerun the scenarios of the regressions, keep the ones every rerun reproduces."""
+    for attempt in range(args.confirm):
+        if not regressions:
+            break
+        scenarios = sorted(set(scenario for scenario, _, _ in regressions))
+        print(f"rerun {attempt + 1}/{args.confirm} of {', '.join(scenarios)} to confirm {len(regressions)} regressions", flush=True)
+        with tempfile.TemporaryDirectory() as work_dir:
+            rerun = {"scenarios": {name: run_scenario(name, SCENARIOS[name], args.repeat, args.symbolic_limit, work_dir) for name in scenarios}}
+        reproduced = compare(rerun, baseline, args.tolerance)
+        regressions = {key: reproduced[key] for key in regressions if key in reproduced}
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic WASM modules")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timings of each stage, each one long enough to last at least 0.2s, the median one is kept (default: 5)")
+    parser.add_argument("--symbolic-limit", type=int, default=5, help="Match sequences executed symbolically per scenario (default: 5)")
+    parser.add_argument("--output", help="Write the results to this JSON file, e.g. to record a new baseline")
+    parser.add_argument("--baseline", help="Compare the results with this JSON file and exit with status 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help=f"Relative change tolerated by the comparison, at least {SHORT_STAGE_TOLERANCE} for stages under {SHORT_STAGE_SECONDS:.0f}s (default: 0.25)")
+    parser.add_argument("--confirm", type=int, default=2, help="Reruns of the scenarios of a regression, it fails the comparison only if every rerun reproduces it (default: 2)")
+    args = parser.parse_args()
+
+    results = {"python": platform.python_version(), "machine": platform.machine(), "scenarios": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.scenarios:
+            results["scenarios"][name] = run_scenario(name, SCENARIOS[name], args.repeat, args.symbolic_limit, work_dir)
+
+    print(f"{'scenario':<12} {'stage':<34} {'items':>8} {'items/s':>12} {'peak KiB':>10}")
+    for name, scenario in results["scenarios"].items():
+        for stage, record in scenario["stages"].items():
+            if "skipped" in record:
+                print(f"{name:<12} {stage:<34} {'skipped':>8}")
+                continue
+            memory = record["peak_memory_kb"] if record["peak_memory_kb"] is not None else record["peak_rss_kb"]
+            print(f"{name:<12} {stage:<34} {record['items']:>8} {record['items_per_second']:>12.1f} {memory:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("python") != results["python"]:
+            print(f"[WARNING]: the baseline was recorded with Python {baseline.get('python')}, not {results['python']}", flush=True)
+        for name, scenario in results["scenarios"].items():
+            for stage, record in scenario["stages"].items():
+                reference = baseline["scenarios"].get(name, {}).get("stages", {}).get(stage, {})
+                if "skipped" in reference and "skipped" not in record:
+                    print(f"[WARNING]: {name}/{stage} was skipped when the baseline was recorded and is not compared", flush=True)
+        regressions = confirm_regressions(compare(results, baseline, args.tolerance), baseline, args)
+        for regression in regressions.values():
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regression against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Generate WASM modules and rule files of controlled size for the benchmarks.
+
+Run from the repository root to write a module, its rule file and its expected front end output:
+    python -m benchmarks.synthetic_wasm out_dir --functions 200 --depth 6 --fanout 3 --matches 4 --loops 2
+"""
+import argparse
+import json
+import os
+import random
+
+WASM_HEADER = b"\x00asm\x01\x00\x00\x00"
+I32 = 0x7f
+FUNC_TYPE = 0x60
+EXPORT_FUNC = 0x00
+
+OP_BLOCK = 0x02
+OP_LOOP = 0x03
+OP_BR = 0x0c
+OP_BR_IF = 0x0d
+OP_END = 0x0b
+OP_CALL = 0x10
+OP_LOCAL_GET = 0x20
+OP_LOCAL_SET = 0x21
+OP_I32_CONST = 0x41
+OP_I32_EQZ = 0x45
+OP_I32_ADD = 0x6a
+OP_I32_SUB = 0x6b
+
+# NOTE: every function is (i32, i32) -> i32, local 2 accumulates the result, the following locals are loop counters
+RESULT_LOCAL = 2
+LOOP_ITERATIONS = 3
+
+def uleb128(value):
+    """Encode an unsigned integer as LEB128."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def sleb128(value):
+    """Encode a signed integer as LEB128."""
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if (value == 0 and not byte & 0x40) or (value == -1 and byte & 0x40):
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+def vector(items):
+    """Encode a WASM vector of already encoded items."""
+    return uleb128(len(items)) + b"".join(items)
+
+def section(section_id, payload):
+    return bytes([section_id]) + uleb128(len(payload)) + payload
+
+def name(text):
+    data = text.encode("utf-8")
+    return uleb128(len(data)) + data
+
+class SyntheticModule():
+    """A generated module: its binary, the offsets of its i32.add instructions, its callgraph and its exported functions"""
+    def __init__(self, binary, add_offsets, callgraph_edges, exported):
+        self.binary = binary
+        self.add_offsets = add_offsets
+        self.callgraph_edges = callgraph_edges
+        self.exported = exported
+
+def generate_callgraph(functions, depth, fanout, rng):
+    """Spread the functions over depth + 1 levels, each function calls fanout functions of the next level, level 0 is exported."""
+    levels = [[] for _ in range(min(depth + 1, functions))]
+    for fidx in range(functions):
+        levels[fidx % len(levels)].append(fidx)
+    calls = {fidx: [] for fidx in range(functions)}
+    for level, next_level in zip(levels, levels[1:]):
+        for fidx in level:
+            calls[fidx] = rng.sample(next_level, min(fanout, len(next_level)))
+    return calls, levels[0]
+
+def function_body(callees, matches, loops):
+    """Return the instructions of a function body as (opcode, immediates) pairs: matches i32.add and the calls nested in loops."""
+    instructions = [(OP_I32_CONST, sleb128(0)), (OP_LOCAL_SET, uleb128(RESULT_LOCAL))]
+    for depth in range(loops):
+        counter = uleb128(RESULT_LOCAL + 1 + depth)
+        instructions += [
+            (OP_I32_CONST, sleb128(LOOP_ITERATIONS)), (OP_LOCAL_SET, counter),
+            (OP_BLOCK, bytes([0x40])), (OP_LOOP, bytes([0x40])),
+            (OP_LOCAL_GET, counter), (OP_I32_EQZ, b""), (OP_BR_IF, uleb128(1)),
+            (OP_LOCAL_GET, counter), (OP_I32_CONST, sleb128(1)), (OP_I32_SUB, b""), (OP_LOCAL_SET, counter),
+        ]
+    for _ in range(matches):
+        instructions += [(OP_LOCAL_GET, uleb128(0)), (OP_LOCAL_GET, uleb128(1)), (OP_I32_ADD, b""), (OP_LOCAL_SET, uleb128(RESULT_LOCAL))]
+    for callee in callees:
+        instructions += [(OP_LOCAL_GET, uleb128(0)), (OP_LOCAL_GET, uleb128(RESULT_LOCAL)), (OP_CALL, uleb128(callee)), (OP_LOCAL_SET, uleb128(RESULT_LOCAL))]
+    for _ in range(loops):
+        instructions += [(OP_BR, uleb128(0)), (OP_END, b""), (OP_END, b"")]
+    instructions += [(OP_LOCAL_GET, uleb128(RESULT_LOCAL)), (OP_END, b"")]
+    return instructions
+
+def generate_module(functions, depth, fanout, matches, loops, seed=0):
+    """Generate a module with the given number of functions, callgraph depth and fan-out, i32.add per function and loop nesting."""
+    rng = random.Random(seed)
+    calls, exported = generate_callgraph(functions, depth, fanout, rng)
+
+    func_type = bytes([FUNC_TYPE]) + vector([bytes([I32]), bytes([I32])]) + vector([bytes([I32])])
+    exports = [name(f"f{fidx}") + bytes([EXPORT_FUNC]) + uleb128(fidx) for fidx in exported]
+    bodies = []
+    add_offsets = {}
+    for fidx in range(functions):
+        instructions = function_body(calls[fidx], matches, loops)
+        # NOTE: offsets are instruction indexes within the function body
+        add_offsets[fidx] = [offset for offset, (opcode, _) in enumerate(instructions) if opcode == OP_I32_ADD]
+        locals_decl = vector([uleb128(1 + loops) + bytes([I32])])
+        code = locals_decl + b"".join(bytes([opcode]) + immediates for opcode, immediates in instructions)
+        bodies.append(uleb128(len(code)) + code)
+
+    binary = WASM_HEADER
+    binary += section(1, vector([func_type]))
+    binary += section(3, vector([uleb128(0)] * functions))
+    binary += section(7, vector(exports))
+    binary += section(10, vector(bodies))
+    callgraph_edges = [(f"node{src}", f"node{dst}") for src in range(functions) for dst in calls[src]]
+    return SyntheticModule(binary, add_offsets, callgraph_edges, [f"node{fidx}" for fidx in exported])
+
+def rule_file_content(rule_count):
+    """A rule file with rule_count i32.add rules applied in sequence, every i32.add of the module matches every rule."""
+    lines = [f"rule{idx} | i32.add: arg1, arg2; arg1 > 0, arg2 > 0" for idx in range(rule_count)]
+    lines.append("! " + " > ".join(f"rule{idx}" for idx in range(rule_count)))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic WASM module and rule file")
+    parser.add_argument("output_dir", help="Directory of the generated files")
+    parser.add_argument("--functions", type=int, default=100, help="Number of functions (default: 100)")
+    parser.add_argument("--depth", type=int, default=4, help="Depth of the callgraph (default: 4)")
+    parser.add_argument("--fanout", type=int, default=2, help="Calls of each function to the next level (default: 2)")
+    parser.add_argument("--matches", type=int, default=2, help="i32.add instructions per function (default: 2)")
+    parser.add_argument("--loops", type=int, default=1, help="Loop nesting around the instructions of each function (default: 1)")
+    parser.add_argument("--rules", type=int, default=2, help="Number of rules in the sequence (default: 2)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    module = generate_module(args.functions, args.depth, args.fanout, args.matches, args.loops, args.seed)
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "module.wasm"), "wb") as f:
+        f.write(module.binary)
+    with open(os.path.join(args.output_dir, "module.rule"), "w") as f:
+        f.write(rule_file_content(args.rules))
+    # NOTE: what the wassail front end is expected to report, to check it or to bypass it
+    with open(os.path.join(args.output_dir, "module.json"), "w") as f:
+        json.dump({"add_offsets": module.add_offsets, "callgraph": module.callgraph_edges, "exported": module.exported}, f)
+
+if __name__ == "__main__":
+    main()
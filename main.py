@@ -1,16 +1,25 @@
 import argparse
+import cProfile
 import os
 import logging
 import sys
 import json
-from multiprocessing import Pool, cpu_count, Manager
-from utils.rule_parser_lark import parse_rule_file
-from utils.collections_utils import generate_ordered_valid_combinations, is_valid_rule_match_sequence
-from utils.wassail_utils import get_rule_matches, get_exported_nodes, get_callgraph
-from utils.dot_file_utils import build_target_subgraph
-from solver import run_symbolic_execution, InstructionHookPlugin, CallHookPlugin
-# TODO: remove
 import time
+import itertools
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from utils.rule_parser_lark import parse_rule_file
+from utils.collections_utils import generate_ordered_match_sequences
+from utils.wassail_utils import run_front_end
+from utils.dot_file_utils import build_target_subgraph, get_edge_functions, node_function_index, write_dot_streaming
+from utils.dispatch_utils import TaskDispatcher
+from utils.cache_utils import ResultCache, file_sha256, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+from utils.metrics_utils import MetricsRecorder
+from utils.cost_utils import RunHistory, CostModel, HISTORY_FILE_NAME
+from utils.wasm_utils import load_function_bodies, get_function_features
+from utils.pruning_utils import SequencePruner
+from utils.journal_utils import TaskJournal, JOURNAL_FILE_NAME
+from solver import run_cached_symbolic_execution, init_worker, is_rule_satisfiable, rule_sequence_fingerprint, Budget, STATUS_BUDGET_EXHAUSTED, InstructionHookPlugin, MatchSequencesPlugin, CallSummaryPlugin
 
 def setup_logging(debug: bool, logfile: str = "/logs/app.log"):
     # File handler
@@ -27,136 +36,514 @@ def setup_logging(debug: bool, logfile: str = "/logs/app.log"):
         force=True,
     )
 
+CONSTRAINTS_DIR_NAME = "constraints"
+# NOTE: constraint bodies larger than this many characters go to side files referenced by the .dot files
+MAX_INLINE_CONSTRAINTS = 64 * 1024
+
+class TaskContext():
+    """What the tasks of a module share: the module, the result cache, the budget and the profiling options"""
+    def __init__(self, module, module_hash, cache, budget, first_witness, profile_dir):
+        self.module = module
+        self.module_hash = module_hash
+        self.cache = cache
+        self.budget = budget
+        self.first_witness = first_witness
+        self.profile_dir = profile_dir
+
+def run_profiled(context, name, function, *args):
+    """Call function(*args), capturing a cProfile dump in the profile directory if profiling is enabled."""
+    if context.profile_dir is None:
+        return function(*args)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return function(*args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(context.profile_dir, f"{name}_{os.getpid()}_{time.time_ns()}.prof"))
+
+def task_metrics(result, start):
+    """Metrics of a task: those of its symbolic execution plus the wall time of the whole task."""
+    metrics = dict(result.metrics)
+    metrics["wall_time"] = time.perf_counter() - start
+    metrics["status"] = result.status
+    return metrics
+
 def symbolic_exec_task(args):
     """Wrapper for parallel symbolic execution with InstructionHookPlugin"""
-    module, fidx, valid_match_sequence = args
+    context, fidx, valid_match_sequence = args
     logging.debug(f"________________________\nSymbolic execution of function {fidx} with match sequence:")
     for match in valid_match_sequence:
         logging.debug(f"\n{match}\n")
     logging.debug("________________________")
 
+    start = time.perf_counter()
     try:
-        constraints = run_symbolic_execution(module, fidx, InstructionHookPlugin(valid_match_sequence))
-        return (fidx, constraints)
+        result = run_profiled(context, f"symbolic_{fidx}", run_cached_symbolic_execution, context.module, fidx, InstructionHookPlugin(valid_match_sequence), context.cache, context.module_hash, context.budget)
+        return [(fidx, result.constraints, result.status)], task_metrics(result, start)
     except Exception as e:
         logging.error(e)
-        return None
+        return [], None
 
-def edge_exec_task(args):
-    """Wrapper for parallel symbolic execution for control flow edges"""
-    module, src_function, dst_function, found_edge_constraints = args
-    if (src_function,dst_function) in found_edge_constraints:
-        return (src_function, dst_function, found_edge_constraints[(src_function,dst_function)])
-    logging.debug(f"calculating {src_function} -> {dst_function}")
-    constraints = run_symbolic_execution(module, src_function, CallHookPlugin(dst_function, src_function))
-    found_edge_constraints[(src_function,dst_function)] = constraints
-    return (src_function, dst_function, constraints)
+def batch_symbolic_exec_task(args):
+    """Wrapper for parallel symbolic execution of all the match sequences of a function with MatchSequencesPlugin"""
+    context, fidx, match_sequences = args
+    logging.debug(f"Symbolic execution of function {fidx} with {len(match_sequences)} match sequences")
 
-def main():
-    parser = argparse.ArgumentParser(description="...")
-    parser.add_argument("rules", help="Path of the file containing the rules")
-    parser.add_argument("module", help="Path of the file containing the WASM module to analyze")
+    start = time.perf_counter()
+    try:
+        result = run_profiled(context, f"symbolic_{fidx}", run_cached_symbolic_execution, context.module, fidx, MatchSequencesPlugin(match_sequences), context.cache, context.module_hash, context.budget)
+        return [(fidx, constraints, result.status) for constraints in result.constraints], task_metrics(result, start)
+    except Exception as e:
+        logging.error(e)
+        return [], None
+
+def call_summary_task(args):
+    """Wrapper for parallel symbolic execution summarizing the constraints of the calls of a function, for all its edges in the callgraph"""
+    context, src_function, callees = args
+    logging.debug(f"summarizing the calls of {src_function} to {sorted(callees)}")
+    start = time.perf_counter()
+    result = run_profiled(context, f"summary_{src_function}", run_cached_symbolic_execution, context.module, src_function, CallSummaryPlugin(src_function, callees, context.first_witness), context.cache, context.module_hash, context.budget)
+    if result.status == STATUS_BUDGET_EXHAUSTED:
+        logging.warning(f"budget exhausted for the calls of {src_function}, constraints are partial")
+    return (src_function, result.constraints, task_metrics(result, start))
+
+class ModuleAnalysis():
+    """Streaming annotation of the sub-callgraphs of a module, each target is written as soon as its symbolic tasks and its edges are resolved"""
+
+    def __init__(self, context, callgraph, exported_nodes, output_dir, enumerate_paths, task_function, symbolic_tasks, metrics, cost_model, journal):
+        self.context = context
+        self.module = context.module
+        self.callgraph = callgraph
+        self.exported_nodes = exported_nodes
+        self.output_dir = output_dir
+        self.enumerate_paths = enumerate_paths
+        self.task_function = task_function
+        self.symbolic_tasks = symbolic_tasks
+        self.metrics = metrics
+        self.cost_model = cost_model
+        self.journal = journal
+        self.side_files = set()
+        # NOTE: batch tasks execute every match sequence of a function, their run history is kept apart
+        self.symbolic_kind = "batch" if task_function is batch_symbolic_exec_task else "symbolic"
+        # NOTE: fidx -> number of symbolic tasks of the target that did not complete yet
+        self.pending_symbolic_tasks = {}
+        for task in symbolic_tasks:
+            self.pending_symbolic_tasks[task[1]] = self.pending_symbolic_tasks.get(task[1], 0) + 1
+        self.found_constraints = {}
+        self.sub_callgraphs = {}
+        # NOTE: fidx -> edges of its sub-callgraph without constraints yet, (src, dst) -> targets waiting for it
+        self.pending_edges = {}
+        self.edge_waiters = {}
+        self.edge_constraints = {}
+        # NOTE: the calls of a function are summarized once for all its callees, src -> callee -> constraints,
+        # and the summary is fanned out to every edge leaving the function in any sub-callgraph
+        self.callees = {}
+        for src, dst in callgraph:
+            self.callees.setdefault(node_function_index(src), set()).add(node_function_index(dst))
+        self.summaries = {}
+        # NOTE: src -> callees covered by the summaries scheduled so far, and by the ones completed
+        self.scheduled_callees = {}
+        self.summarized_callees = {}
+        self.waiting_callees = {}
+        self.summary_tasks = 0
+        self.edge_references = 0
+        # NOTE: src -> [(callees, summary)] journaled by an interrupted run, indexed on the first replayed summary
+        self.journaled_summaries = None
+
+    def task_key(self, kind, fidx, callees=None):
+        """Identify a task of this module in the run history, a call summary by the number of callees it covers."""
+        # NOTE: first-witness summaries of the same function can cover different callees, their wall times are kept apart
+        if callees is not None:
+            return f"{kind}:{fidx}:{len(callees)}"
+        return f"{self.symbolic_kind if kind == 'symbolic' else kind}:{fidx}"
+
+    def task_cost(self, kind, fidx, callees=None):
+        """Predicted cost of a task executing function fidx, used to send the longest tasks first."""
+        return self.cost_model.estimate(self.task_key(kind, fidx, callees), fidx)
+
+    def journal_key(self, kind, task):
+        """Identify a task of this module in the journal: the function it executes and what its plugin looks for."""
+        if kind == "summary":
+            return ("summary", task[1], tuple(sorted(task[2])))
+        if self.symbolic_kind == "batch":
+            return ("batch", task[1], tuple(rule_sequence_fingerprint(sequence) for sequence in task[2]))
+        return ("symbolic", task[1], rule_sequence_fingerprint(task[2]))
+
+    def record_task(self, kind, fidx, metrics, history, callees=None):
+        """Record the metrics of a completed task and its wall time in the run history."""
+        self.metrics.record_task(kind, {"fidx": fidx}, metrics)
+        # NOTE: a cached result says nothing about the cost of the execution
+        if history is not None and not metrics.get("cached"):
+            history.record(self.context.module_hash, self.task_key(kind, fidx, callees), fidx, metrics["wall_time"])
+
+    def replay(self, kind, task):
+        """Return (True, result) if a task completed in an interrupted run, (False, None) otherwise."""
+        found, result = self.journal.get(self.journal_key(kind, task))
+        if found or kind != "summary" or not self.context.first_witness:
+            return found, result
+        return self._replay_summary(task[1], set(task[2]))
+
+    def _replay_summary(self, src_function, callees):
+        # NOTE: which callees a first-witness summary covers depends on the order results arrive,
+        # the journaled summaries of the function are reused if together they cover the requested callees
+        if self.journaled_summaries is None:
+            self.journaled_summaries = {}
+            for key, result in self.journal.completed.items():
+                if key[0] == "summary":
+                    self.journaled_summaries.setdefault(key[1], []).append((set(key[2]), result[1]))
+        covered = set()
+        summary = {}
+        for journaled_callees, journaled_summary in self.journaled_summaries.get(src_function, ()):
+            for callee in (journaled_callees & callees) - covered:
+                if callee in journaled_summary:
+                    summary[callee] = journaled_summary[callee]
+                covered.add(callee)
+        if covered != callees:
+            return False, None
+        return True, (src_function, summary, None)
+
+    def add_symbolic_result(self, fidx, task_results):
+        """Record the results of a symbolic task, return the (source function, callees) summaries the sub-callgraph of the target needs the first time it has constraints."""
+        for _, constraints, status in task_results:
+            if status == STATUS_BUDGET_EXHAUSTED:
+                logging.warning(f"budget exhausted for function {fidx}, constraints are partial")
+            if constraints:
+                logging.debug(f"Constraints for function {fidx}:")
+                for c in constraints:
+                    logging.debug(c)
+                self.found_constraints.setdefault(fidx, []).append(constraints)
+
+        new_summaries = {}
+        if fidx in self.found_constraints and fidx not in self.sub_callgraphs:
+            with self.metrics.phase("sub_callgraphs"):
+                sub_callgraph = build_target_subgraph(self.callgraph, f"node{fidx}", self.exported_nodes, self.enumerate_paths)
+            self.sub_callgraphs[fidx] = sub_callgraph
+            if sub_callgraph is None:
+                logging.info(f"function {fidx} is not reachable from any exported function")
+            else:
+                logging.debug(f"sub-callgraph for function {fidx}:")
+                logging.debug(sub_callgraph)
+                edges = get_edge_functions(sub_callgraph)
+                self.edge_references += len(edges)
+                self.pending_edges[fidx] = set()
+                for edge in edges:
+                    src_function, dst_function = edge
+                    if dst_function in self.summarized_callees.get(src_function, ()):
+                        self.edge_constraints[edge] = self.summaries[src_function].get(dst_function, [])
+                    if edge in self.edge_constraints:
+                        continue
+                    self.pending_edges[fidx].add(edge)
+                    self.edge_waiters.setdefault(edge, set()).add(fidx)
+                    self.waiting_callees.setdefault(src_function, set()).add(dst_function)
+                    if dst_function not in self.scheduled_callees.get(src_function, ()):
+                        new_summaries.setdefault(src_function, set()).add(dst_function)
+
+        self.pending_symbolic_tasks[fidx] -= 1
+        self._write_if_resolved(fidx)
+        return [(src_function, self._schedule_summary(src_function, callees)) for src_function, callees in new_summaries.items()]
+
+    def _schedule_summary(self, src_function, waiting):
+        # NOTE: a complete run summarizes every callee of the function at once, a run stopping at the first witnesses
+        # only waits for the callees edges are waiting on, the callees of later edges get a summary of their own
+        callees = set(waiting) if self.context.first_witness else set(self.callees[src_function])
+        self.scheduled_callees.setdefault(src_function, set()).update(callees)
+        self.summary_tasks += 1
+        return callees
+
+    def add_summary_result(self, src_function, callees, summary):
+        """Record the call summary of a function for the given callees and resolve the waiting edges leaving it to them."""
+        self.summaries.setdefault(src_function, {}).update(summary)
+        self.summarized_callees.setdefault(src_function, set()).update(callees)
+        waiting = self.waiting_callees.get(src_function, set())
+        for dst_function in waiting & set(callees):
+            waiting.discard(dst_function)
+            self.add_edge_result(src_function, dst_function, summary.get(dst_function, []))
+        if not waiting:
+            self.waiting_callees.pop(src_function, None)
+
+    def add_edge_result(self, src_function, dst_function, constraints):
+        """Record the constraints of an edge and write every target that was only waiting for it."""
+        edge = (src_function, dst_function)
+        self.edge_constraints[edge] = constraints
+        for fidx in self.edge_waiters.pop(edge, ()):
+            self.pending_edges[fidx].discard(edge)
+            self._write_if_resolved(fidx)
+
+    def _write_if_resolved(self, fidx):
+        if self.pending_symbolic_tasks.get(fidx) or self.pending_edges.get(fidx):
+            return
+        self.pending_edges.pop(fidx, None)
+        sub_callgraph = self.sub_callgraphs.pop(fidx, None)
+        target_constraints = self.found_constraints.pop(fidx, None)
+        if sub_callgraph is not None:
+            with self.metrics.phase("writing"):
+                self.write_annotated_subgraph(fidx, sub_callgraph, target_constraints)
+
+    def side_file(self, name, body):
+        """Write a constraint body too large to be inlined in the .dot files to a side file, once, and return its path relative to the output directory."""
+        path = os.path.join(CONSTRAINTS_DIR_NAME, f"{name}.smt2")
+        if path not in self.side_files:
+            os.makedirs(os.path.join(self.output_dir, CONSTRAINTS_DIR_NAME), exist_ok=True)
+            with open(os.path.join(self.output_dir, path), "w") as f:
+                f.write(body)
+            self.side_files.add(path)
+        return path
+
+    def write_annotated_subgraph(self, fidx, sub_callgraph, target_constraints):
+        """Annotate the sub-callgraph of a target with the edge and target constraints and write it to the output directory."""
+        for edge in sub_callgraph.get_edges():
+            src_function = node_function_index(edge.get_source())
+            dst_function = node_function_index(edge.get_destination())
+            # NOTE: constraints arrive serialized as SMT-LIB scripts, joined once instead of concatenated one by one
+            comment = "".join(self.edge_constraints.get((src_function, dst_function)))
+            if len(comment) > MAX_INLINE_CONSTRAINTS:
+                edge.set("constraints_file", json.dumps(self.side_file(f"edge_{src_function}_{dst_function}", comment)))
+                comment = ""
+            edge.set_comment(comment)
+        node = sub_callgraph.get_node(f"node{fidx}")
+        if node:
+            node[0].set("label", "target")
+            node[0].set("color", "\"red\"")
+            target_constraints_readable = []
+            for idx, constraint_list in enumerate(target_constraints):
+                constraint = "".join(constraint_list)
+                # NOTE: a huge body is replaced by a reference to its side file
+                if len(constraint) > MAX_INLINE_CONSTRAINTS:
+                    constraint = {"file": self.side_file(f"function_{fidx}_target_{idx}", constraint)}
+                target_constraints_readable.append(constraint)
+            node[0].set("comment",json.dumps(target_constraints_readable))
+        with open(os.path.join(self.output_dir, f"function_{fidx}_annotated_sub-callgraph.dot"), "w") as f:
+            write_dot_streaming(sub_callgraph, f)
+        logging.info(f"annotated sub-callgraph of function {fidx} written")
+
+def add_analysis_arguments(parser):
+    """Add the options shared by the single-module and the batch entry points."""
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--output-dir", default="/output", help="Directory of the annotated sub-callgraphs (default: /output)")
     parser.add_argument(
         "-j","--jobs",
         type=int,
         default=4,
         help="Number of concurrent processes to use for parallel execution (default: 4)"
     )
-    args = parser.parse_args()
-    setup_logging(args.debug)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Directory of the persistent symbolic execution result cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024), help="Maximum size of the result cache in MiB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent result cache")
+    parser.add_argument("--timeout", type=float, help="Wall-clock limit in seconds of each symbolic execution, also bounding each of its solver queries")
+    parser.add_argument("--max-states", type=int, help="Limit on the states explored by each symbolic execution")
+    parser.add_argument("--max-instructions", type=int, help="Limit on the instructions executed by each symbolic execution")
+    parser.add_argument("--first-witness", action="store_true", help="Stop each call summary execution once every callee the edges wait on has a feasible call")
+    parser.add_argument("--batch", action="store_true", help="Check all the match sequences of a function in a single symbolic execution")
+    parser.add_argument("--enumerate-paths", action="store_true", help="Build sub-callgraphs by enumerating every simple path instead of using reachability")
+    parser.add_argument("--no-prune", action="store_true", help="Disable the static pruning of the match sequences before symbolic execution")
+    parser.add_argument("--resume", action="store_true", help=f"Reuse the tasks completed by an interrupted run, read from {JOURNAL_FILE_NAME} in the output directory")
+    parser.add_argument("--profile", action="store_true", help="Write cProfile dumps of the parent and of every task to <output-dir>/profiles")
 
-    args.jobs = min(cpu_count(), args.jobs)
+def profile_directory(args):
+    """Return the directory of the cProfile dumps, None if profiling is disabled."""
+    if not args.profile:
+        return None
+    profile_dir = os.path.join(args.output_dir, "profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
 
-    rule_set = parse_rule_file(args.rules)
-    rule_matches = get_rule_matches(rule_set, args.module)
+def prepare_module_analysis(rules, module, output_dir, args, cache, budget, profile_dir=None, history=None):
+    """Run the front end on a module and build its symbolic tasks, return None if no match sequence was found."""
+    os.makedirs(output_dir, exist_ok=True)
+    metrics = MetricsRecorder(output_dir)
+    with metrics.phase("front_end"):
+        module_hash = file_sha256(module)
+        rule_set = parse_rule_file(rules)
+        rule_matches, exported_nodes, callgraph = run_front_end(rule_set, module, cache, module_hash)
 
     if len(rule_matches) == 0:
-        logging.info("No match for the provided rule set was found")
-        return
+        logging.info(f"No match for the provided rule set was found in {module}")
+        metrics.close()
+        return None
     # else:
     #     print("matches found", flush=True)
     # for match in rule_matches[0]:
     #     print(match)
 
+    with metrics.phase("static_analysis"):
+        bodies = load_function_bodies(module)
+        pruner = None
+        if not args.no_prune:
+            # NOTE: matches in functions no export can reach and matches of contradictory rules can never produce a result
+            pruner = SequencePruner(callgraph, exported_nodes, bodies, rule_matches)
+            unsatisfiable_rules = set()
+            for rule_id, rule in enumerate(rule_set.rules):
+                if not is_rule_satisfiable(rule):
+                    logging.warning(f"the constraints of rule {rule.name} contradict each other, it can never match")
+                    unsatisfiable_rules.add(rule_id)
+            rule_matches = pruner.prune_rule_matches(unsatisfiable_rules)
+
     key_order = rule_set.application_order
-    callgraph = get_callgraph(args.module)
-    found_constraints = {}
-    # return
     # Step 1: Prepare tasks for symbolic execution of rule matches
-    symbolic_tasks = []
-    for combo in generate_ordered_valid_combinations(rule_matches, is_valid_rule_match_sequence, key_order):
-        valid_match_sequence = list(combo.values()) # contains a sequence of matches that respects the order enforced by the rule file
-        symbolic_tasks.append((args.module, valid_match_sequence[0].fidx, valid_match_sequence))
+    match_sequences = {}
+    with metrics.phase("match_sequences"):
+        for combo in generate_ordered_match_sequences(rule_matches, key_order):
+            valid_match_sequence = list(combo.values()) # contains a sequence of matches that respects the order enforced by the rule file
+            # NOTE: a sequence whose matches cannot execute one after the other in the control flow of the function is dropped
+            if pruner is not None and not pruner.keep(valid_match_sequence):
+                continue
+            match_sequences.setdefault(valid_match_sequence[0].fidx, []).append(valid_match_sequence)
+    if pruner is not None:
+        logging.info(f"statically pruned in {module}: {dict(pruner.pruned)}")
     
     # NOTE: it was impossible to build a match sequence that satisfies the expected rule sequence 
-    if len(symbolic_tasks) == 0:
-        logging.info("No match for the provided rule set was found")
-        return
-
-    logging.info(f"number of matches:{len(symbolic_tasks)}")
-    # Step 2: Run symbolic executions in parallel
-    with Pool(processes=args.jobs) as pool:
-        symbolic_results = pool.map(symbolic_exec_task, symbolic_tasks)
-    symbolic_results = [sym_res for sym_res in symbolic_results if sym_res is not None]
-
-    # Step 3: Collect results
-    for fidx, constraints in symbolic_results:
-        if constraints:
-            logging.debug(f"Constraints for function {fidx}:")
-            for c in constraints:
-                logging.debug(c)
-            found_constraints.setdefault(fidx, []).append(constraints)
-
-    # Step 4: Build subgraphs and prepare edge execution tasks
-    exported_nodes = get_exported_nodes(args.module)
-    edge_tasks = []
-    sub_callgraph_list = []
-    # NOTE: create a shared dict containing tuples ((src,dst), constraints)
-    manager = Manager()
-    found_edge_constraints = manager.dict()
-    # NOTE: create the tasks to edge tasks to be executed in parallel
-    for fidx, _ in found_constraints.items():
-        sub_callgraph = build_target_subgraph(callgraph, f"node{fidx}", exported_nodes)
-        edges = sub_callgraph.get_edges()
-        for edge in edges:
-            src_function = int(edge.get_source().strip('"').strip("node"))
-            dst_function = int(edge.get_destination().strip('"').strip("node"))
-            edge_tasks.append((args.module, src_function, dst_function, found_edge_constraints))
-        sub_callgraph_list.append((fidx, sub_callgraph))
-        logging.debug(f"sub-callgraph for function {fidx}:")
-        logging.debug(sub_callgraph)
-
-    # Step 5: Run edge-based symbolic executions in parallel
-    with Pool(processes=args.jobs) as pool:
-        edge_results = pool.map(edge_exec_task, edge_tasks)
-
-    # Step 6: Annotate the callgraph with constraints
-    edge_constraints_map = {(src, dst): cons for src, dst, cons in edge_results}
-    for fidx, sub_callgraph in sub_callgraph_list:
-        edges = sub_callgraph.get_edges()
-        for edge in edges:
-            src_function = int(edge.get_source().strip('"').strip("node"))
-            dst_function = int(edge.get_destination().strip('"').strip("node"))
-            constraints = edge_constraints_map.get((src_function, dst_function))
-            comment = ""
-            for c in constraints:
-                comment += c.to_string()
-            edge.set_comment(comment)
-        node = sub_callgraph.get_node(f"node{fidx}")
-        if node:
-            node[0].set("label", "target")
-            node[0].set("color", "\"red\"")
-            target_constraints_readable = []
-            target_constraints = found_constraints.get(fidx)
-            for constraint_list in target_constraints:
-                constraint = ""
-                for c in constraint_list:
-                    constraint += c.to_string()
-                target_constraints_readable.append(constraint)
-            node[0].set("comment",json.dumps(target_constraints_readable))
-        with open(f"/output/function_{fidx}_annotated_sub-callgraph.dot", "w") as f:
-            f.write(sub_callgraph.to_string())
+    if len(match_sequences) == 0:
+        logging.info(f"No match for the provided rule set was found in {module}")
+        metrics.close()
+        return None
+
+    context = TaskContext(module, module_hash, cache, budget, args.first_witness, profile_dir)
+    cost_model = CostModel(get_function_features(bodies), callgraph, history.get(module_hash) if history is not None else None)
+
+    if args.batch:
+        # NOTE: one symbolic execution per function tracks all of its match sequences at once
+        task_function = batch_symbolic_exec_task
+        symbolic_tasks = [(context, fidx, sequences) for fidx, sequences in match_sequences.items()]
+    else:
+        task_function = symbolic_exec_task
+        symbolic_tasks = [(context, fidx, sequence) for fidx, sequences in match_sequences.items() for sequence in sequences]
+
+    # NOTE: results depend on the module, the rules and the options changing what the tasks compute
+    journal_header = (module_hash, file_sha256(rules), args.batch, args.first_witness, budget.timeout, budget.max_states, budget.max_instructions)
+    journal = TaskJournal(os.path.join(output_dir, JOURNAL_FILE_NAME), journal_header, args.resume)
+
+    logging.info(f"number of matches in {module}:{sum(len(sequences) for sequences in match_sequences.values())}")
+    return ModuleAnalysis(context, callgraph, exported_nodes, output_dir, args.enumerate_paths, task_function, symbolic_tasks, metrics, cost_model, journal)
+
+def open_run_history(args):
+    """Return the run history kept in the cache directory, None if the cache is disabled."""
+    if args.no_cache:
+        return None
+    return RunHistory(os.path.join(args.cache_dir, HISTORY_FILE_NAME))
+
+def run_module_analyses(pool, analyses, args, history=None, max_modules=None):
+    """Run the symbolic and edge tasks of every analysis on a shared pool, streaming results into the annotated sub-callgraphs.
+
+    analyses can be a lazy iterable, at most max_modules of them (all if None) are in flight at once, the next one is pulled when one finishes.
+    """
+    # NOTE: edge tasks have priority so that each annotated sub-callgraph is written as soon as possible,
+    # tasks of different modules are dispatched round-robin, the tasks of a module by decreasing predicted cost
+    dispatcher = TaskDispatcher(pool, args.jobs, ["summary", "symbolic"])
+    # NOTE: tasks completed by an interrupted run are replayed from the journal instead of being dispatched
+    replayed = deque()
+    pending_analyses = iter(analyses)
+    # NOTE: group -> analysis in flight, its number of tasks not completed yet and when its first task was submitted
+    active = {}
+    outstanding = {}
+    started = {}
+    groups = itertools.count()
+
+    def submit(kind, function, task, group, cost):
+        outstanding[group] += 1
+        found, result = active[group].replay(kind, task)
+        if found:
+            replayed.append((kind, group, task, result))
+        else:
+            dispatcher.submit(kind, function, task, group, cost)
+
+    def finish(group):
+        analysis = active.pop(group)
+        del outstanding[group]
+        analysis.journal.close()
+        # NOTE: from the first task of the module to its last result, the pool is shared with the other modules in flight
+        analysis.metrics.add_phase_time("tasks", time.perf_counter() - started.pop(group))
+        analysis.metrics.close()
+        logging.info(f"{analysis.summary_tasks} call summary executions for {analysis.edge_references} edges in the sub-callgraphs of {analysis.module}")
+
+    def start_modules():
+        while max_modules is None or len(active) < max_modules:
+            analysis = next(pending_analyses, None)
+            if analysis is None:
+                return
+            group = next(groups)
+            active[group] = analysis
+            outstanding[group] = 0
+            started[group] = time.perf_counter()
+            for task in analysis.symbolic_tasks:
+                submit("symbolic", analysis.task_function, task, group, analysis.task_cost("symbolic", task[1]))
+            if outstanding[group] == 0:
+                finish(group)
+
+    def completed_tasks():
+        results = dispatcher.results()
+        while True:
+            if replayed:
+                yield replayed.popleft()
+                continue
+            item = next(results, None)
+            if item is None:
+                # NOTE: the dispatcher stops when it runs dry, replayed results and new modules may have submitted tasks since
+                results = dispatcher.results()
+                item = next(results, None)
+                if item is None:
+                    return
+            yield item
+
+    start_modules()
+    # Step 2: Stream the results of the symbolic executions into sub-callgraph construction and edge scheduling.
+    for kind, group, task, result in completed_tasks():
+        analysis = active[group]
+        outstanding[group] -= 1
+        if kind == "symbolic":
+            fidx = task[1]
+            task_results, metrics = result if result is not None else ([], None)
+            # NOTE: tasks without metrics failed or were replayed, only fresh completed tasks are journaled
+            if metrics is not None:
+                analysis.record_task(kind, fidx, metrics, history)
+                analysis.journal.record(analysis.journal_key(kind, task), (task_results, None))
+            # Step 3: Build the sub-callgraph of the target and summarize the calls of the functions on its edges
+            for src_function, callees in analysis.add_symbolic_result(fidx, task_results):
+                submit("summary", call_summary_task, (analysis.context, src_function, callees), group, analysis.task_cost("summary", src_function, callees))
+        else:
+            # Step 4: Annotate and write the sub-callgraphs whose edges are all resolved
+            src_function = task[1]
+            if result is not None and result[2] is not None:
+                analysis.record_task(kind, src_function, result[2], history, task[2])
+                analysis.journal.record(analysis.journal_key(kind, task), (src_function, result[1], None))
+            analysis.add_summary_result(src_function, task[2], result[1] if result is not None else {})
+        # NOTE: a module without tasks left is written out and released, the next one takes its place
+        if outstanding[group] == 0:
+            finish(group)
+            start_modules()
+
+def main():
+    parser = argparse.ArgumentParser(description="...")
+    parser.add_argument("rules", help="Path of the file containing the rules")
+    parser.add_argument("module", help="Path of the file containing the WASM module to analyze")
+    add_analysis_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.debug)
+
+    args.jobs = min(cpu_count(), args.jobs)
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    budget = Budget(args.timeout, args.max_states, args.max_instructions)
+
+    profile_dir = profile_directory(args)
+    profiler = None
+    if profile_dir is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    history = open_run_history(args)
+    analysis = prepare_module_analysis(args.rules, args.module, args.output_dir, args, cache, budget, profile_dir, history)
+    if analysis is not None:
+        with Pool(processes=args.jobs, initializer=init_worker, initargs=(args.module, budget)) as pool:
+            run_module_analyses(pool, [analysis], args, history)
+
+    if history is not None:
+        history.save()
+
+    if cache is not None:
+        cache.evict()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, "parent.prof"))
 
 if __name__ == "__main__":
     main()
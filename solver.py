@@ -1,12 +1,67 @@
+import hashlib
+import logging
+import math
+import operator
+import pickle
+import resource
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import reduce, wraps
 from manticore.wasm import ManticoreWASM, types
+from manticore.wasm.manticore import _make_initial_state
 from manticore.core.plugin import Plugin
+from manticore.core.smtlib import ConstraintSet, Z3Solver
+from manticore.core.smtlib.expression import BoolAnd, BoolConstant
+from manticore.core.smtlib.visitors import get_variables, simplify, translate_to_smtlib
+from manticore.utils import config
 from utils.rule_parser_lark import RuleMatch, Rule
+from utils.smt_utils import find_implied_assertions
+
+# NOTE: worker-resident caches, each pool worker decodes a module once and reuses it for every task it runs.
+# Workers shared by several modules keep only the most recently used ones
+MAX_RESIDENT_MODULES = 8
+_initial_states = OrderedDict()
+_param_specs = {}
+# NOTE: worker-resident feasibility cache, states reaching the same target or call edge often carry the same constraints
+MAX_FEASIBILITY_CACHE_ENTRIES = 100000
+_feasibility_cache = OrderedDict()
+# NOTE: per worker counters, run_symbolic_execution reports their increase during each task.
+# The feasibility solver calls are the checks of the plugins missing the cache, the solver queries and time
+# count every query of the worker, including the ones Manticore makes to fork and concretize states
+solver_stats = {"feasibility_checks": 0, "feasibility_cache_hits": 0, "feasibility_solver_calls": 0, "solver_queries": 0, "solver_time": 0.0}
+_solver_stats_lock = threading.Lock()
+# NOTE: the Z3Solver methods sending queries to z3, the ones calling each other are only counted once
+SOLVER_QUERY_METHODS = ("can_be_true", "get_all_values", "get_value", "optimize", "minmax", "max", "min")
+_solver_calls = threading.local()
+
+STATUS_COMPLETE = "complete"
+STATUS_BUDGET_EXHAUSTED = "budget exhausted"
+STATUS_STOPPED_EARLY = "stopped early"
 
 class Param():
     def __init__(self, name, size):
         self.name = name
         self.size = size
 
+class Budget():
+    """Per-task limits of a symbolic execution, None means unlimited"""
+    def __init__(self, timeout=None, max_states=None, max_instructions=None):
+        self.timeout = timeout
+        self.max_states = max_states
+        self.max_instructions = max_instructions
+
+    def is_limited(self):
+        return self.timeout is not None or self.max_states is not None or self.max_instructions is not None
+
+class ExecutionResult():
+    """The constraints found by a symbolic execution, the reason it ended and its metrics"""
+    def __init__(self, constraints, status=STATUS_COMPLETE, metrics=None):
+        self.constraints = constraints
+        self.status = status
+        self.metrics = metrics or {}
+
 class InstructionHookPlugin(Plugin):
     """A plugin that hooks the instruction execution and applies constraints specified in the rule file"""
 
@@ -15,54 +70,293 @@ class InstructionHookPlugin(Plugin):
         # solve for the input symbols once these are over
         self.rule_instances = rule_instances
         self.match_constraints = []
+        # NOTE: (funcaddr, offset) of the instructions the rules apply to, checked before looking at the state progress
+        self.hooked_locations = frozenset((rule_match.fidx, rule_match.offset) for rule_match in rule_instances)
+        self.hooked_instructions = 0
+
+    def fingerprint(self):
+        """Identify the results of this plugin for the result cache: the rule sequence and its match locations."""
+        return ("InstructionHookPlugin",) + rule_sequence_fingerprint(self.rule_instances)
 
     # NOTE: apply at match
     def generic_solver(self, state, current_instruction):
-        with self.locked_context("counter", dict) as ctx:
-            current_rule_idx = ctx.setdefault("current_rule_idx", 0)
+        # NOTE: the progress in the rule sequence belongs to the state, forked states inherit a copy of it
+        current_rule_idx = state.context.get("current_rule_idx", 0)
+        current_rule = self.rule_instances[current_rule_idx]
+        if current_instruction.funcaddr == current_rule.fidx and current_instruction.offset == current_rule.offset:
+            # NOTE: collect the operands in the order of the rule parameters
+            # we reverse the array because WASM is a stack machine (last pushed value is the last param of the instruction)
+            operands = [state.stack.peek_nth(idx+1) for idx in range(len(current_rule.rule.parameters))][::-1]
+            for build_constraint in current_rule.rule.constraint_builders:
+                state.constrain(build_constraint(*operands))
+            # NOTE: a state that cannot satisfy the rule can no longer complete the sequence
+            if not is_feasible_cached(state):
+                state.abandon()
+            # NOTE: all constraints where applied, the state completed the sequence and needs no further exploration
+            if current_rule_idx == len(self.rule_instances)-1:
+                self.match_constraints.append(snapshot_constraints(state))
+                state.abandon()
 
-        # NOTE: abandon ALL the states once done
-        if current_rule_idx > len(self.rule_instances)-1:
-            state.abandon()
-        
-        if len(self.rule_instances) > 0:
-            current_rule = self.rule_instances[current_rule_idx]
-            if current_instruction.funcaddr == current_rule.fidx and current_instruction.offset == current_rule.offset:
-                symbolic_parameters = []
-                # NOTE: declare parameters starting from the rule
-                # we reverse the array because WASM is a stack machine (last pushed value is the last param of the instruction)
-                # match target instruction
-                for idx, param in enumerate(current_rule.rule.parameters[::-1]):
-                    locals()[param] = state.stack.peek_nth(idx+1)
-                for constraint in current_rule.rule.constraints:
-                    state.constrain(eval(constraint))
-                # NOTE: all constraints where applied, we are ready to try and concretize the state
-                if current_rule_idx == len(self.rule_instances)-1:
-                    if (state.is_feasible()):
-                        self.match_constraints.append(state._constraints)
-                
-                # NOTE: we found the rule match, we can proceed to the next one
-                with self.locked_context("counter", dict) as ctx:
-                    ctx['current_rule_idx'] += 1
+            # NOTE: we found the rule match, this state can proceed to the next one
+            state.context["current_rule_idx"] = current_rule_idx + 1
 
     def will_execute_instruction_callback(self, state, *args):
         """ callback for the will_execute_instruction event"""
 
         instruction = args[0]
+        # NOTE: almost no instruction is part of the rule sequence, skip them before looking at the state
+        if (instruction.funcaddr, instruction.offset) not in self.hooked_locations:
+            return
+        self.hooked_instructions += 1
         self.generic_solver(state, instruction)
 
-class CallHookPlugin(Plugin):
-    """A plugin that hooks the execution of both call and call_indirect in order to find constraints related to a specific edge in the callgraph"""
+class MatchSequencesPlugin(Plugin):
+    """A plugin that tracks every candidate match sequence of a function in a single symbolic execution"""
 
-    def __init__(self, target_function_call, target_src):
+    def __init__(self, match_sequences):
+        super().__init__()
+        self.match_sequences = match_sequences
+        # NOTE: one list of constraint sets per sequence, the same shape InstructionHookPlugin returns for a single one
+        self.match_constraints = [[] for _ in match_sequences]
+        # NOTE: (funcaddr, offset) -> [(sequence index, position of the rule in the sequence)]
+        self.hooked_locations = {}
+        for sequence_idx, rule_instances in enumerate(match_sequences):
+            for rule_idx, rule_match in enumerate(rule_instances):
+                self.hooked_locations.setdefault((rule_match.fidx, rule_match.offset), []).append((sequence_idx, rule_idx))
+        self.hooked_instructions = 0
+
+    def fingerprint(self):
+        """Identify the results of this plugin for the result cache: every rule sequence and its match locations."""
+        return ("MatchSequencesPlugin",) + tuple(rule_sequence_fingerprint(rule_instances) for rule_instances in self.match_sequences)
+
+    def generic_solver(self, state, current_instruction, hooks):
+        # NOTE: the state is shared by all the sequences, so the rule constraints are kept aside per sequence instead of constraining the state.
+        # progress is None once a sequence is completed or can no longer be completed by this state
+        progress = list(state.context.get("sequence_progress", (0,) * len(self.match_sequences)))
+        pending = list(state.context.get("sequence_constraints", ((),) * len(self.match_sequences)))
+        for sequence_idx, rule_idx in hooks:
+            if progress[sequence_idx] != rule_idx:
+                continue
+            rule = self.match_sequences[sequence_idx][rule_idx].rule
+            # NOTE: collect the operands in the order of the rule parameters
+            # we reverse the array because WASM is a stack machine (last pushed value is the last param of the instruction)
+            operands = [state.stack.peek_nth(idx+1) for idx in range(len(rule.parameters))][::-1]
+            sequence_constraints = pending[sequence_idx] + tuple(build_constraint(*operands) for build_constraint in rule.constraint_builders)
+            if not is_feasible_cached(state, sequence_constraints):
+                progress[sequence_idx] = None
+                pending[sequence_idx] = ()
+            elif rule_idx == len(self.match_sequences[sequence_idx])-1:
+                self.match_constraints[sequence_idx].append(snapshot_constraints(state, sequence_constraints))
+                progress[sequence_idx] = None
+                pending[sequence_idx] = ()
+            else:
+                progress[sequence_idx] = rule_idx + 1
+                pending[sequence_idx] = sequence_constraints
+        state.context["sequence_progress"] = tuple(progress)
+        state.context["sequence_constraints"] = tuple(pending)
+        # NOTE: abandon the state once none of the sequences can make progress on it
+        if all(rule_idx is None for rule_idx in progress):
+            state.abandon()
+
+    def will_execute_instruction_callback(self, state, *args):
+        """ callback for the will_execute_instruction event"""
+
+        instruction = args[0]
+        hooks = self.hooked_locations.get((instruction.funcaddr, instruction.offset))
+        if hooks is None:
+            return
+        self.hooked_instructions += 1
+        self.generic_solver(state, instruction, hooks)
+
+class CallSummaryPlugin(Plugin):
+    """A plugin that hooks the execution of both call and call_indirect to summarize the constraints of every call of a function, by callee"""
+
+    def __init__(self, target_src, target_calls, first_witness=False):
         super().__init__()
-        self.target_call = target_function_call
         self.target_src = target_src
-        self.match_constraints = []
+        self.target_calls = frozenset(target_calls)
+        self.first_witness = first_witness
+        self.stopped_early = False
+        self.hooked_instructions = 0
+        # NOTE: callee -> constraints of every feasible call to it, one run of the source function serves all its outgoing edges
+        self.match_constraints = {}
+
+    def fingerprint(self):
+        """Identify the results of this plugin for the result cache: the source function and the callees it summarizes."""
+        return ("CallSummaryPlugin", self.target_src, tuple(sorted(self.target_calls)), self.first_witness)
+
     def will_call_function_callback(self, state, *args):
         called_function, current_function = args
-        if (current_function == self.target_src and called_function == self.target_call and state.is_feasible()):
-            self.match_constraints.append(state._constraints)
+        self.hooked_instructions += 1
+        if current_function != self.target_src or called_function not in self.target_calls:
+            return
+        # NOTE: with first_witness, a callee that already has a witness needs no further feasibility check
+        if self.first_witness and called_function in self.match_constraints:
+            return
+        if is_feasible_cached(state):
+            self.match_constraints.setdefault(called_function, []).append(snapshot_constraints(state))
+            # NOTE: a single feasible witness per callee is enough, stop the whole run once every callee has one
+            if self.first_witness and len(self.match_constraints) == len(self.target_calls) and not self.stopped_early:
+                self.stopped_early = True
+                self.manticore.kill()
+
+class MetricsPlugin(Plugin):
+    """A plugin that counts the states explored by a run"""
+
+    def __init__(self):
+        super().__init__()
+        self.states = 0
+
+    def did_enqueue_state_callback(self, *args):
+        self.states += 1
+
+class BudgetPlugin(Plugin):
+    """A plugin that kills the run once the wall-clock, state or instruction budget of the task is exhausted"""
+
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+        self.states = 0
+        self.instructions = 0
+        self.exhausted = None
+
+    def exhaust(self, reason):
+        """Stop the run, keeping the results found so far."""
+        if self.exhausted is None:
+            self.exhausted = reason
+            logging.info(f"symbolic execution budget exhausted: {reason}")
+            self.manticore.kill()
+
+    def did_enqueue_state_callback(self, *args):
+        self.states += 1
+        if self.budget.max_states is not None and self.states > self.budget.max_states:
+            self.exhaust(f"more than {self.budget.max_states} states")
+
+    def will_execute_instruction_callback(self, state, *args):
+        if self.budget.max_instructions is None:
+            return
+        self.instructions += 1
+        if self.instructions > self.budget.max_instructions:
+            self.exhaust(f"more than {self.budget.max_instructions} instructions")
+
+def rule_sequence_fingerprint(rule_instances):
+    """Identify a rule sequence and its match locations."""
+    return tuple(
+        (rule_match.rule.target_instruction, tuple(rule_match.rule.parameters), tuple(rule_match.rule.constraints), rule_match.fidx, rule_match.offset)
+        for rule_match in rule_instances
+    )
+
+def flatten_conjunctions(constraint):
+    """Split a constraint into the operands of its top-level conjunctions."""
+    if isinstance(constraint, BoolAnd):
+        for operand in constraint.operands:
+            yield from flatten_conjunctions(operand)
+    else:
+        yield constraint
+
+def add_declared(constraint_set, constraint):
+    """Add a constraint to a ConstraintSet, declaring its variables that the set does not declare yet."""
+    # NOTE: ConstraintSet.add does not declare the variables, to_string would otherwise miss their declare-fun
+    for variable in get_variables(constraint):
+        if variable.name not in constraint_set._declarations:
+            constraint_set._declare(variable)
+    constraint_set.add(constraint)
+
+def simplify_constraints(constraints):
+    """Build a standalone ConstraintSet from the given constraints, dropping trivially true ones, duplicates, also inside a conjunction, and the ones the others imply."""
+    conjuncts = {}
+    for constraint in constraints:
+        if isinstance(constraint, bool):
+            constraint = BoolConstant(value=constraint)
+        for conjunct in flatten_conjunctions(simplify(constraint)):
+            if isinstance(conjunct, BoolConstant) and conjunct.value:
+                continue
+            conjuncts.setdefault(translate_to_smtlib(conjunct), conjunct)
+    # NOTE: sorted so that the same constraints always lose the same implied conjuncts
+    assertions = sorted(conjuncts)
+    declarations = sorted(set(variable.declaration for conjunct in conjuncts.values() for variable in get_variables(conjunct)))
+    implied = find_implied_assertions(declarations, assertions)
+    simplified = ConstraintSet()
+    for idx, smtlib in enumerate(assertions):
+        if idx not in implied:
+            add_declared(simplified, conjuncts[smtlib])
+    return simplified
+
+def serialize_constraints(constraint_set):
+    """Serialize a ConstraintSet into a deterministic SMT-LIB script: the sorted declarations of its variables, then its sorted assertions."""
+    declarations = set(variable.declaration for variable in constraint_set.get_declared_variables())
+    # NOTE: no let bindings, Manticore numbers them with a process-wide counter and the same constraints would get different scripts
+    assertions = set(f"(assert {translate_to_smtlib(constraint)})" for constraint in constraint_set.constraints)
+    # NOTE: states often end with the same constraints, identical scripts are interned so that pickling sends them once
+    return sys.intern("\n".join(sorted(declarations) + sorted(assertions)) + "\n")
+
+def snapshot_constraints(state, extra_constraints=()):
+    """Serialize the constraints of a state, together with extra constraints, once simplified, so that results leave the worker as compact strings instead of expression trees."""
+    # NOTE: the snapshot declares the variables of every constraint it keeps, the script is standalone
+    return serialize_constraints(simplify_constraints(tuple(state.constraints.constraints) + tuple(extra_constraints)))
+
+def chain_key(key, constraints):
+    """Extend a constraints key with more constraints, in the order they are given."""
+    for constraint in constraints:
+        if isinstance(constraint, bool):
+            text = str(constraint).lower()
+        else:
+            # NOTE: the declarations carry the sizes of the variables, the same names can have different sizes in different functions
+            text = translate_to_smtlib(constraint) + "".join(sorted(variable.declaration for variable in get_variables(constraint)))
+        key = hashlib.sha256(key + text.encode("utf-8")).digest()
+    return key
+
+def constraints_key(state, extra_constraints=()):
+    """Key of the constraints of a state together with extra constraints, extending the key of its path with the constraints added since."""
+    # NOTE: constraints are only appended along a path and forked states inherit a copy of the context,
+    # so each check hashes the constraints added since the last check of the path instead of the whole set
+    constraints = state.constraints.constraints
+    count, key = state.context.get("constraints_key", (0, b""))
+    if count > len(constraints):
+        count, key = 0, b""
+    if count < len(constraints):
+        key = chain_key(key, constraints[count:])
+        state.context["constraints_key"] = (len(constraints), key)
+    if extra_constraints:
+        key = chain_key(key, extra_constraints)
+    return key
+
+def is_feasible_cached(state, extra_constraints=()):
+    """Check if the constraints of the state, together with extra constraints, are satisfiable, reusing the answers of this worker for the same constraints."""
+    solver_stats["feasibility_checks"] += 1
+    key = constraints_key(state, extra_constraints)
+    feasible = _feasibility_cache.get(key)
+    if feasible is not None:
+        solver_stats["feasibility_cache_hits"] += 1
+        _feasibility_cache.move_to_end(key)
+        return feasible
+    solver_stats["feasibility_solver_calls"] += 1
+    if extra_constraints:
+        feasible = state.can_be_true(reduce(operator.and_, extra_constraints, True))
+    else:
+        feasible = state.is_feasible()
+    _feasibility_cache[key] = feasible
+    if len(_feasibility_cache) > MAX_FEASIBILITY_CACHE_ENTRIES:
+        _feasibility_cache.popitem(last=False)
+    return feasible
+
+# NOTE: operand width of the rule target instructions, by type prefix of the mnemonic
+OPERAND_WIDTHS = {"i32": 32, "i64": 64}
+
+def is_rule_satisfiable(rule):
+    """Check if the constraints of a rule can hold together on fresh operands, a rule that cannot be checked is assumed satisfiable."""
+    width = OPERAND_WIDTHS.get(rule.target_instruction.split(".")[0])
+    if width is None:
+        return True
+    constraints = ConstraintSet()
+    operands = [constraints.new_bitvec(width, name=f"{rule.name}_{parameter}") for parameter in rule.parameters]
+    try:
+        for build_constraint in rule.constraint_builders:
+            constraints.add(build_constraint(*operands))
+        return Z3Solver.instance().can_be_true(constraints)
+    except Exception as e:
+        logging.warning(f"could not check the constraints of rule {rule.name}, keeping it: {e}")
+        return True
 
 def param_generator(state, params):
     """Symbolic parameter generator"""
@@ -71,20 +365,123 @@ def param_generator(state, params):
         sym_params.append(state.new_symbolic_value(param.size, param.name))
     return sym_params
 
-def run_symbolic_execution(module, function_index, plugin):
-    """Execute the function identified by function_index of the specified module with the specified plugin."""
-    # NOTE: Initialize ManticoreWASM with the target WebAssembly file
-    m = ManticoreWASM(module)
-    types = m.get_params_by_func_index(function_index)[0]
-    param_specs = []
-    for idx, type in enumerate(types):
-        param_specs.append(Param(f"param_{idx}", type.get_size()))
+def load_module(module):
+    """Return the pickled initial state of the module, decoding the .wasm binary only the first time it is requested in this process."""
+    if module not in _initial_states:
+        _initial_states[module] = pickle.dumps(_make_initial_state(module), protocol=pickle.HIGHEST_PROTOCOL)
+        while len(_initial_states) > MAX_RESIDENT_MODULES:
+            evicted, _ = _initial_states.popitem(last=False)
+            for key in [key for key in _param_specs if key[0] == evicted]:
+                del _param_specs[key]
+    _initial_states.move_to_end(module)
+    return _initial_states[module]
+
+def configure_solver(budget):
+    """Bound every solver query of this process by the task timeout of the budget."""
+    # NOTE: the budget timer only kills the run between two instructions, it cannot interrupt a query stuck in z3.
+    # Manticore reads the timeout when it starts a z3 process, so it must be set before the first query of the worker,
+    # a query that times out is considered unsatisfiable
+    if budget is not None and budget.timeout is not None:
+        config.get_group("smt").timeout = max(1, math.ceil(budget.timeout))
+
+def timed_query(method):
+    """Wrap a Z3Solver method to count its calls and their time in solver_stats, unless it is called by another query."""
+    @wraps(method)
+    def query(*args, **kwargs):
+        depth = getattr(_solver_calls, "depth", 0)
+        _solver_calls.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _solver_calls.depth = depth
+            if depth == 0:
+                # NOTE: Manticore may explore states in several threads of the worker
+                with _solver_stats_lock:
+                    solver_stats["solver_queries"] += 1
+                    solver_stats["solver_time"] += time.perf_counter() - start
+    query.timed_query = True
+    return query
+
+def instrument_solver():
+    """Count and time every query of the Z3Solver instances of this process."""
+    for name in SOLVER_QUERY_METHODS:
+        method = getattr(Z3Solver, name, None)
+        if method is not None and not getattr(method, "timed_query", False):
+            setattr(Z3Solver, name, timed_query(method))
+
+def init_worker(module, budget=None):
+    """Pool initializer that loads the module once per worker process, if any, and bounds its solver queries."""
+    configure_solver(budget)
+    if module is not None:
+        load_module(module)
+
+def get_param_specs(m, module, function_index):
+    """Return the symbolic parameter specs of a function, resolving its signature only once per process."""
+    key = (module, function_index)
+    if key not in _param_specs:
+        types = m.get_params_by_func_index(function_index)[0]
+        _param_specs[key] = [Param(f"param_{idx}", type.get_size()) for idx, type in enumerate(types)]
+    return _param_specs[key]
+
+def run_symbolic_execution(module, function_index, plugin, budget=None):
+    """Execute the function identified by function_index of the specified module with the specified plugin, within the optional budget."""
+    startup_begin = time.perf_counter()
+    instrument_solver()
+    stats_begin = dict(solver_stats)
+    # NOTE: Initialize ManticoreWASM from a copy of the worker-resident initial state of the WebAssembly file
+    m = ManticoreWASM(pickle.loads(load_module(module)))
+    param_specs = get_param_specs(m, module, function_index)
+    startup_time = time.perf_counter() - startup_begin
+    logging.debug(f"startup of the symbolic execution of function {function_index} took {startup_time:.3f}s")
     # NOTE: Register our instruction execution hook
     # NOTE: The Rule is provided by the RuleSet, fidx and offset are provided by the wassail output 
     m.register_plugin(plugin)
+    metrics_plugin = MetricsPlugin()
+    m.register_plugin(metrics_plugin)
+    budget_plugin = None
+    timer = None
+    if budget is not None and budget.is_limited():
+        budget_plugin = BudgetPlugin(budget)
+        m.register_plugin(budget_plugin)
+        if budget.timeout is not None:
+            timer = threading.Timer(budget.timeout, budget_plugin.exhaust, args=(f"{budget.timeout}s timeout",))
+            timer.daemon = True
     # NOTE: Call the function with symbolic arguments
     m.invoke_by_index(function_index, param_generator, param_specs)
-    m.run()
+    if timer is not None:
+        timer.start()
+    try:
+        m.run()
+    finally:
+        if timer is not None:
+            timer.cancel()
     # m.finalize()
-    return plugin.match_constraints
+    metrics = {
+        "startup_time": startup_time,
+        "states": metrics_plugin.states,
+        "hooked_instructions": getattr(plugin, "hooked_instructions", 0),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    for name, value in solver_stats.items():
+        metrics[name] = value - stats_begin[name]
+    if budget_plugin is not None and budget_plugin.exhausted is not None:
+        return ExecutionResult(plugin.match_constraints, STATUS_BUDGET_EXHAUSTED, metrics)
+    if getattr(plugin, "stopped_early", False):
+        return ExecutionResult(plugin.match_constraints, STATUS_STOPPED_EARLY, metrics)
+    return ExecutionResult(plugin.match_constraints, metrics=metrics)
 
+def run_cached_symbolic_execution(module, function_index, plugin, cache=None, module_hash=None, budget=None):
+    """Execute run_symbolic_execution unless the result cache already holds the result for the same module, function and plugin fingerprint."""
+    if cache is None:
+        return run_symbolic_execution(module, function_index, plugin, budget)
+    key = cache.key(module_hash, function_index, plugin.fingerprint())
+    hit, result = cache.get(key)
+    if hit:
+        result.metrics = {"cached": True}
+        return result
+    result = run_symbolic_execution(module, function_index, plugin, budget)
+    # NOTE: partial results depend on the budget, they are recomputed by later runs
+    if result.status != STATUS_BUDGET_EXHAUSTED:
+        cache.put(key, result)
+    return result
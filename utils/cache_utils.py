@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+DEFAULT_CACHE_DIR = "/cache"
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+# NOTE: bump when the format of the cached values changes, older entries become unreachable and are evicted
+CACHE_FORMAT_VERSION = 4
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of the file at the given path."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache():
+    """A content-addressed on-disk cache of symbolic execution results with size-bounded LRU eviction."""
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, module_hash, function_index, fingerprint):
+        """Build the cache key of a symbolic execution from the module hash, the function index and the plugin fingerprint."""
+        return hashlib.sha256(repr((CACHE_FORMAT_VERSION, module_hash, function_index, fingerprint)).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pickle")
+
+    def get(self, key):
+        """Return (True, value) if the key is cached, (False, None) otherwise."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (EOFError, pickle.UnpicklingError) as e:
+            # NOTE: a truncated entry is a miss, it will be overwritten by the next put
+            logging.warning(f"Discarding corrupted cache entry {path}: {e}")
+            return False, None
+        # NOTE: the modification time is used as last access time by evict
+        os.utime(path)
+        return True, value
+
+    def put(self, key, value):
+        """Store a value, atomically replacing any previous entry so that concurrent workers never read partial files."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_size bytes."""
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            # NOTE: entries live in subdirectories, top-level files such as the run history are not evicted
+            if root == self.cache_dir:
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        logging.debug(f"cache size after eviction: {total_size} bytes")
@@ -1,3 +1,4 @@
+from bisect import bisect_right
 from collections import defaultdict
 from itertools import product
 
@@ -17,6 +18,48 @@ def generate_ordered_valid_combinations(data_map, check_function, key_order):
 
         if check_function(ordered):
             yield ordered
+
+def generate_ordered_match_sequences(data_map, key_order):
+    """Lazily generate the same combinations as generate_ordered_valid_combinations with is_valid_rule_match_sequence, walking only in-order sequences inside a single function."""
+    # NOTE: create combinations only if there is at least one match per rule
+    if set(data_map.keys()) != set(key_order):
+        return
+    # NOTE: a rule repeated in the sequence keeps its first position, as in reorder_combination
+    ordered_keys = list(dict.fromkeys(key_order))
+
+    # NOTE: per rule, group the matches by function and sort them by offset
+    grouped = []
+    for key in ordered_keys:
+        by_fidx = defaultdict(list)
+        for rule_match in data_map[key]:
+            by_fidx[rule_match.fidx].append(rule_match)
+        for matches in by_fidx.values():
+            matches.sort(key=lambda rule_match: rule_match.offset)
+        grouped.append(by_fidx)
+
+    # NOTE: only functions containing a match for every rule can hold a valid sequence
+    candidate_fidxs = set(grouped[0].keys())
+    for by_fidx in grouped[1:]:
+        candidate_fidxs &= by_fidx.keys()
+
+    for fidx in sorted(candidate_fidxs):
+        function_matches = [by_fidx[fidx] for by_fidx in grouped]
+        function_offsets = [[rule_match.offset for rule_match in matches] for matches in function_matches]
+        yield from _walk_function_sequences(ordered_keys, function_matches, function_offsets, 0, -1, [])
+
+def _walk_function_sequences(keys, function_matches, function_offsets, depth, last_offset, sequence):
+    """Depth-first walk over the matches of one function, extending the sequence only with strictly increasing offsets."""
+    if depth == len(keys):
+        yield dict(zip(keys, sequence))
+        return
+    matches = function_matches[depth]
+    # NOTE: skip every match that does not come after the previous one
+    start = bisect_right(function_offsets[depth], last_offset) if depth > 0 else 0
+    for rule_match in matches[start:]:
+        sequence.append(rule_match)
+        yield from _walk_function_sequences(keys, function_matches, function_offsets, depth + 1, rule_match.offset, sequence)
+        sequence.pop()
+
 # valid sequence check
 def is_valid_rule_match_sequence(combination):
     """Check if a combination of rule matches occurs sequentially within the same function."""
@@ -29,12 +72,11 @@ def is_valid_rule_match_sequence(combination):
         elif last_fidx != rule_match.fidx:
             return False
         # instruction in the same function must be in sequence
-        if last_offset == None:
-            last_offset = rule_match.offset
-        elif last_offset >= rule_match.offset:
+        if last_offset != None and last_offset >= rule_match.offset:
             return False
+        last_offset = rule_match.offset
     return True
 # Reorder combination
 def reorder_combination(combo, key_order):
     """Reorder a combination dictionary according to the specified key_order."""
-    return {key: combo[key] for key in key_order if key in combo}
\ No newline at end of file
+    return {key: combo[key] for key in key_order if key in combo}
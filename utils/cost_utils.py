@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import statistics
+import tempfile
+from collections import OrderedDict, defaultdict
+from utils.dot_file_utils import node_function_index
+
+HISTORY_FILE_NAME = "run_history.json"
+# NOTE: the history keeps the measurements of the most recently analyzed modules only
+MAX_HISTORY_MODULES = 1000
+# NOTE: weight of a new measurement in the running average of a task
+HISTORY_SMOOTHING = 0.5
+
+class RunHistory():
+    """Wall times of past tasks by module hash and task key, persisted as JSON to predict the cost of the next runs"""
+
+    def __init__(self, path):
+        self.path = path
+        self.modules = OrderedDict()
+        try:
+            with open(path) as f:
+                self.modules = OrderedDict(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            logging.warning(f"Discarding unreadable run history {path}: {e}")
+
+    def get(self, module_hash):
+        """Return task key -> [function index, seconds] for the past tasks of a module."""
+        return self.modules.get(module_hash, {})
+
+    def record(self, module_hash, task_key, fidx, seconds):
+        """Add the wall time of a task to its running average."""
+        tasks = self.modules.setdefault(module_hash, {})
+        self.modules.move_to_end(module_hash)
+        previous = tasks.get(task_key)
+        if previous is not None:
+            seconds = HISTORY_SMOOTHING * seconds + (1 - HISTORY_SMOOTHING) * previous[1]
+        tasks[task_key] = [fidx, seconds]
+
+    def save(self):
+        """Write the history, atomically replacing the previous one."""
+        while len(self.modules) > MAX_HISTORY_MODULES:
+            self.modules.popitem(last=False)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.modules, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+class CostModel():
+    """Predict the cost of the tasks of a module from the static features of its functions and the past runs of its tasks"""
+
+    def __init__(self, features, callgraph_edges, past_tasks=None):
+        self.features = features
+        self.past_tasks = past_tasks or {}
+        self.callees = defaultdict(set)
+        for src, dst in callgraph_edges:
+            src, dst = node_function_index(src), node_function_index(dst)
+            if src != dst:
+                self.callees[src].add(dst)
+        known_costs = [self._body_cost(feature) for feature in features.values()]
+        # NOTE: functions without features (e.g. the module could not be decoded) cost as much as an average one
+        self.default_cost = statistics.mean(known_costs) if known_costs else 1.0
+        # NOTE: seconds per unit of static cost, calibrated on the tasks of the module that were measured before
+        ratios = [seconds / self.static_cost(fidx) for fidx, seconds in self.past_tasks.values()]
+        self.scale = statistics.median(ratios) if ratios else None
+
+    def _body_cost(self, feature):
+        # NOTE: every loop multiplies the paths explored through the body
+        return max(feature.instructions, 1) * (1 + feature.loops)
+
+    def function_cost(self, fidx):
+        feature = self.features.get(fidx)
+        return self._body_cost(feature) if feature is not None else self.default_cost
+
+    def static_cost(self, fidx):
+        """Cost of executing a function from its own body and the bodies of the functions it calls."""
+        return self.function_cost(fidx) + sum(self.function_cost(callee) for callee in self.callees.get(fidx, ()))
+
+    def estimate(self, task_key, fidx):
+        """Predicted cost of a task executing function fidx: its past wall time if known, else its static cost."""
+        past = self.past_tasks.get(task_key)
+        if past is not None:
+            return past[1]
+        if self.scale is not None:
+            return self.static_cost(fidx) * self.scale
+        return self.static_cost(fidx)
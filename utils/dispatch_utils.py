@@ -0,0 +1,63 @@
+import heapq
+import itertools
+import logging
+import queue
+from collections import OrderedDict
+
+class TaskDispatcher():
+    """Dispatch tasks to a multiprocessing pool one at a time as workers free up and yield their results as soon as they complete."""
+
+    def __init__(self, pool, max_in_flight, kinds):
+        self.pool = pool
+        self.max_in_flight = max_in_flight
+        # NOTE: queues are served in the order of kinds, earlier kinds have priority.
+        # Inside a kind, the groups (e.g. modules) are served round-robin so that none of them starves the others,
+        # inside a group the most expensive tasks go first so that no long task is left for the end of the run
+        self.queues = {kind: OrderedDict() for kind in kinds}
+        self.order = itertools.count()
+        self.completed = queue.Queue()
+        self.in_flight = 0
+
+    def submit(self, kind, function, args, group=None, cost=0):
+        """Queue function(args) with its estimated cost, it is sent to the pool once a worker is free and no task of an earlier kind is waiting."""
+        # NOTE: tasks of equal cost keep their submission order
+        heapq.heappush(self.queues[kind].setdefault(group, []), (-cost, next(self.order), function, args))
+
+    def _next_task(self):
+        for kind, groups in self.queues.items():
+            for group, tasks in groups.items():
+                _, _, function, args = heapq.heappop(tasks)
+                if tasks:
+                    groups.move_to_end(group)
+                else:
+                    del groups[group]
+                return kind, group, function, args
+        return None
+
+    def _dispatch(self):
+        while self.in_flight < self.max_in_flight:
+            task = self._next_task()
+            if task is None:
+                return
+            kind, group, function, args = task
+            # NOTE: callbacks run in the pool result thread, the main thread only reads the completed queue
+            self.pool.apply_async(
+                function,
+                (args,),
+                callback=lambda result, kind=kind, group=group, args=args: self.completed.put((kind, group, args, result)),
+                error_callback=lambda error, kind=kind, group=group, args=args: self.completed.put((kind, group, args, error)),
+            )
+            self.in_flight += 1
+
+    def results(self):
+        """Yield (kind, group, args, result) for every task as it completes, result is None if the task raised. Tasks can be submitted while iterating."""
+        while True:
+            self._dispatch()
+            if self.in_flight == 0:
+                return
+            kind, group, args, result = self.completed.get()
+            self.in_flight -= 1
+            if isinstance(result, BaseException):
+                logging.error(f"{kind} task failed: {result}")
+                result = None
+            yield kind, group, args, result
@@ -1,6 +1,10 @@
 import pydot
+import re
 from collections import defaultdict
 
+# NOTE: matches the edge statements of a DOT file, e.g. `node1 -> node2;` or `"node1" -> "node2" [label=...];`
+EDGE_PATTERN = re.compile(r'^\s*("?)([^\s"\[;{}]+)\1\s*->\s*("?)([^\s"\[;{}]+)\3')
+
 def load_dot_file(path):
     """Load a DOT file from the given path and return the first graph if available, else None."""    
     graphs = pydot.graph_from_dot_file(path)
@@ -10,13 +14,34 @@ def normalize_node(name):
     """Remove surrounding quotes from a node name."""
     return name.strip('"')
 
-def build_adjacency_and_reverse(graph):
-    """Build adjacency and reverse adjacency dictionaries from a pydot graph."""
+def node_function_index(name):
+    """Return the function index of a callgraph node name such as "node42"."""
+    return int(normalize_node(name).strip("node"))
+
+def get_edge_functions(graph):
+    """Return the (src, dst) function indexes of every edge of a pydot graph."""
+    return [(node_function_index(edge.get_source()), node_function_index(edge.get_destination())) for edge in graph.get_edges()]
+
+def parse_dot_edges(lines):
+    """Stream the lines of a DOT file and return its (src, dst) edges, without building the full pydot graph."""
+    edges = []
+    for line in lines:
+        match = EDGE_PATTERN.match(line)
+        if match:
+            edges.append((match.group(2), match.group(4)))
+    return edges
+
+def get_dot_edges(graph):
+    """Return the (src, dst) node names of every edge of a pydot graph."""
+    return [(normalize_node(edge.get_source()), normalize_node(edge.get_destination())) for edge in graph.get_edges()]
+
+def build_adjacency_and_reverse(edges):
+    """Build adjacency and reverse adjacency dictionaries from a list of (src, dst) edges."""
     adj = defaultdict(list)
     rev_adj = defaultdict(list)
-    for edge in graph.get_edges():
-        src = normalize_node(edge.get_source())
-        dst = normalize_node(edge.get_destination())
+    for src, dst in edges:
+        src = normalize_node(src)
+        dst = normalize_node(dst)
         adj[src].append(dst)
         rev_adj[dst].append(src)
     return adj, rev_adj
@@ -71,19 +96,39 @@ def find_all_paths_to_target(adj, roots, target):
         dfs(root, [root])
     return paths
 
-def build_subgraph_from_paths(paths, exported_nodes):
-    """Construct a new pydot subgraph from a list of paths and mark exported nodes with a comment."""
-    new_graph = pydot.Dot(graph_type='digraph')
-    nodes = set()
-    edges = set()
+def find_nodes_reaching_target(adj, rev_adj, roots, target):
+    """Find the nodes lying on some walk from the given root nodes to a target node, in time linear in the size of the graph."""
+    # NOTE: forward reachability from the roots
+    forward = set()
+    stack = [root for root in roots]
+    while stack:
+        node = stack.pop()
+        if node in forward:
+            continue
+        forward.add(node)
+        # NOTE: walks end at the target, its successors are only relevant if they are reachable from elsewhere
+        if node != target:
+            stack.extend(adj.get(node, []))
+
+    if target not in forward:
+        return set()
+
+    # NOTE: backward reachability from the target, restricted to forward reachable nodes
+    relevant = set()
+    stack = [target]
+    while stack:
+        node = stack.pop()
+        if node in relevant:
+            continue
+        relevant.add(node)
+        stack.extend(parent for parent in rev_adj.get(node, []) if parent in forward)
+    return relevant
 
-    for path in paths:
-        for i in range(len(path)):
-            nodes.add(path[i])
-            if i > 0:
-                edges.add((path[i - 1], path[i]))
+def build_subgraph(nodes, edges, exported_nodes):
+    """Construct a new pydot subgraph from sets of nodes and edges and mark exported nodes with a comment."""
+    new_graph = pydot.Dot(graph_type='digraph')
 
-    for node in nodes:
+    for node in sorted(nodes):
         dot_node = pydot.Node(node)
         dot_node.set_shape("record")
         if node in exported_nodes:
@@ -91,20 +136,59 @@ def build_subgraph_from_paths(paths, exported_nodes):
             dot_node.set_color("\"green\"")
         new_graph.add_node(dot_node)
 
-    for src, dst in edges:
+    for src, dst in sorted(edges):
         new_graph.add_edge(pydot.Edge(src, dst))
 
     return new_graph
 
-def build_target_subgraph(graph, target_node, exported_nodes):
-    """Build a subgraph containing all paths from exported nodes to a target node within a given graph."""
-    adj, _ = build_adjacency_and_reverse(graph)
+def write_dot_streaming(graph, f):
+    """Write a pydot graph element by element to a file, without building the whole DOT text in memory."""
+    f.write(f"{graph.get_graph_type()} {graph.get_name()} {{\n")
+    for node in graph.get_nodes():
+        f.write(node.to_string() + "\n")
+    for edge in graph.get_edges():
+        f.write(edge.to_string() + "\n")
+    f.write("}\n")
+
+def build_subgraph_from_paths(paths, exported_nodes):
+    """Construct a new pydot subgraph from a list of paths and mark exported nodes with a comment."""
+    nodes = set()
+    edges = set()
+
+    for path in paths:
+        for i in range(len(path)):
+            nodes.add(path[i])
+            if i > 0:
+                edges.add((path[i - 1], path[i]))
+
+    return build_subgraph(nodes, edges, exported_nodes)
+
+def build_subgraph_from_reachability(adj, nodes, target, exported_nodes):
+    """Construct a new pydot subgraph containing every edge between the given nodes, except the ones leaving the target."""
+    edges = set()
+    for src in nodes:
+        if src == target:
+            continue
+        for dst in adj.get(src, []):
+            if dst in nodes:
+                edges.add((src, dst))
+    return build_subgraph(nodes, edges, exported_nodes)
+
+def build_target_subgraph(callgraph_edges, target_node, exported_nodes, enumerate_paths=False):
+    """Build a subgraph containing all paths from exported nodes to a target node within a graph given by its (src, dst) edges, enumerating every simple path only if enumerate_paths is set."""
+    adj, rev_adj = build_adjacency_and_reverse(callgraph_edges)
     target_node = normalize_node(target_node)
     exported_nodes = [normalize_node(n) for n in exported_nodes]
 
-    paths = find_all_paths_to_target(adj, exported_nodes, target_node)
+    # NOTE: the number of simple paths is exponential on callgraphs with diamonds and recursion, reachability is linear
+    if enumerate_paths:
+        paths = find_all_paths_to_target(adj, exported_nodes, target_node)
+        if paths:
+            return build_subgraph_from_paths(paths, exported_nodes)
+        return None
 
-    if paths:
-        return build_subgraph_from_paths(paths, exported_nodes)
+    nodes = find_nodes_reaching_target(adj, rev_adj, exported_nodes, target_node)
+    if nodes:
+        return build_subgraph_from_reachability(adj, nodes, target_node, exported_nodes)
     else:
         return None
@@ -0,0 +1,72 @@
+import logging
+import os
+import pickle
+
+JOURNAL_FILE_NAME = "journal.pickle"
+# NOTE: bump when the format of the journal records changes, older journals are then discarded by --resume
+JOURNAL_FORMAT_VERSION = 3
+
+class TaskJournal():
+    """An append-only journal of the completed tasks of a module analysis and their results, replayed to resume an interrupted run"""
+
+    def __init__(self, path, header, resume=False):
+        self.path = path
+        self.header = (JOURNAL_FORMAT_VERSION,) + tuple(header)
+        self.completed = {}
+        valid_size = self._load() if resume else None
+        if valid_size is None:
+            with open(path, "wb"):
+                pass
+            self._append(self.header)
+        else:
+            # NOTE: a record cut by the interruption is dropped, the next records are appended after the last complete one
+            os.truncate(path, valid_size)
+            logging.info(f"resuming from {len(self.completed)} completed tasks in {path}")
+
+    def _load(self):
+        """Read the completed tasks of a previous run, return the size of its complete records or None if it cannot be resumed."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            try:
+                header = pickle.load(f)
+            except Exception:
+                header = None
+            if header != self.header:
+                logging.warning(f"{self.path} belongs to another module, rule file or configuration, starting from scratch")
+                return None
+            valid_size = f.tell()
+            while True:
+                try:
+                    key, result = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    logging.warning(f"ignoring the truncated end of {self.path}: {e}")
+                    break
+                self.completed[key] = result
+                valid_size = f.tell()
+        return valid_size
+
+    def _append(self, record):
+        # NOTE: the file is only open while a record is appended, a batch keeps one journal per module and could run out of descriptors
+        with open(self.path, "ab") as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # NOTE: the record must survive the container being killed right after the task completed
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(self, key):
+        """Return (True, result) if the task identified by key completed in a previous run, (False, None) otherwise."""
+        if key in self.completed:
+            return True, self.completed[key]
+        return False, None
+
+    def record(self, key, result):
+        """Append the result of a completed task."""
+        self._append((key, result))
+
+    def close(self):
+        """Nothing to release, the file is closed after every record."""
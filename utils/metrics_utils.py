@@ -0,0 +1,60 @@
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+class MetricsRecorder():
+    """Phase timers and per-task metrics of the analysis of a module, written as JSONL next to its .dot outputs."""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, "metrics.jsonl")
+        self.summary_path = os.path.join(output_dir, "metrics_summary.json")
+        self.phases = {}
+        self.tasks = {}
+        self._started = False
+
+    def _write(self, record):
+        # NOTE: records are appended one by one so that a crashed run keeps its metrics,
+        # the file is only open while writing, a batch keeps the metrics of many modules at once
+        with open(self.path, "a" if self._started else "w") as f:
+            f.write(json.dumps(record) + "\n")
+        self._started = True
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the analysis, phases with the same name are accumulated."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start)
+
+    def add_phase_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self._write({"type": "phase", "name": name, "seconds": seconds})
+
+    def record_task(self, kind, task_id, metrics):
+        """Record the metrics of a completed task, identified by task_id, and add them to the totals of its kind."""
+        self._write({"type": "task", "kind": kind, **task_id, **metrics})
+        totals = self.tasks.setdefault(kind, {"count": 0})
+        totals["count"] += 1
+        for name, value in metrics.items():
+            if name == "peak_rss_kb":
+                totals[name] = max(totals.get(name, 0), value)
+            elif isinstance(value, (bool, int, float)):
+                totals[name] = totals.get(name, 0) + value
+
+    def close(self):
+        """Write the summary of the phases and tasks."""
+        for totals in self.tasks.values():
+            # NOTE: tells whether the feasibility cache of the workers pays for the hashing of the constraints
+            if totals.get("feasibility_checks"):
+                totals["feasibility_cache_hit_rate"] = totals.get("feasibility_cache_hits", 0) / totals["feasibility_checks"]
+        summary = {
+            "phases": self.phases,
+            "tasks": self.tasks,
+            "parent_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        with open(self.summary_path, "w") as f:
+            json.dump(summary, f, indent=2)
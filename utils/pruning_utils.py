@@ -0,0 +1,142 @@
+import logging
+from collections import defaultdict
+from utils.dot_file_utils import build_adjacency_and_reverse, node_function_index, normalize_node
+from utils.wasm_utils import build_control_flow, decoded_mnemonic, is_reachable
+
+def find_reachable_functions(callgraph_edges, exported_nodes):
+    """Return the indexes of the functions reachable from an exported function in the callgraph."""
+    adj, _ = build_adjacency_and_reverse(callgraph_edges)
+    reachable = set()
+    stack = [normalize_node(node) for node in exported_nodes]
+    while stack:
+        node = stack.pop()
+        if node in reachable:
+            continue
+        reachable.add(node)
+        stack.extend(adj.get(node, []))
+    return set(node_function_index(node) for node in reachable)
+
+def find_recursive_functions(callgraph_edges):
+    """Return the indexes of the functions on a cycle of the callgraph through themselves, directly or through other functions."""
+    callees = defaultdict(set)
+    for src, dst in callgraph_edges:
+        callees[node_function_index(src)].add(node_function_index(dst))
+    # NOTE: iterative Tarjan, the functions of a strongly connected component with several functions or a self call are recursive
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    component_stack = []
+    recursive = set()
+    for root in list(callees):
+        if root in index:
+            continue
+        work = [(root, iter(callees[root]))]
+        index[root] = lowlink[root] = len(index)
+        component_stack.append(root)
+        on_stack.add(root)
+        while work:
+            fidx, successors = work[-1]
+            callee = next(successors, None)
+            if callee is not None:
+                if callee not in index:
+                    index[callee] = lowlink[callee] = len(index)
+                    component_stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(callees.get(callee, ()))))
+                elif callee in on_stack:
+                    lowlink[fidx] = min(lowlink[fidx], index[callee])
+                continue
+            work.pop()
+            if work:
+                lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[fidx])
+            if lowlink[fidx] == index[fidx]:
+                component = []
+                while True:
+                    member = component_stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == fidx:
+                        break
+                if len(component) > 1 or fidx in callees.get(fidx, ()):
+                    recursive.update(component)
+    return recursive
+
+class SequencePruner():
+    """Cheap static checks that drop the matches and match sequences that cannot produce a result, before any symbolic run is spent on them"""
+
+    def __init__(self, callgraph_edges, exported_nodes, bodies, rule_matches):
+        self.reachable_functions = find_reachable_functions(callgraph_edges, exported_nodes)
+        self.recursive_functions = find_recursive_functions(callgraph_edges)
+        # NOTE: None when the module could not be decoded, every sequence is then kept by the control flow check
+        self.bodies = bodies
+        self.rule_matches = rule_matches
+        # NOTE: (fidx, mnemonic) -> offsets of every matched instruction, whatever rule it matched
+        self.match_offsets = defaultdict(set)
+        for matches in rule_matches.values():
+            for rule_match in matches:
+                self.match_offsets[(rule_match.fidx, rule_match.rule.target_instruction)].add(rule_match.offset)
+        self.control_flows = {}
+        self.positions = {}
+        self.reachability = {}
+        self.pruned = defaultdict(int)
+
+    def prune_rule_matches(self, unsatisfiable_rules):
+        """Drop the matches in functions unreachable from the exports and the matches of rules whose constraints contradict each other."""
+        pruned_matches = {}
+        for rule_id, matches in self.rule_matches.items():
+            if rule_id in unsatisfiable_rules:
+                self.pruned["unsatisfiable rule"] += len(matches)
+                continue
+            kept = [rule_match for rule_match in matches if rule_match.fidx in self.reachable_functions]
+            self.pruned["unreachable function"] += len(matches) - len(kept)
+            if kept:
+                pruned_matches[rule_id] = kept
+        return pruned_matches
+
+    def _instruction_positions(self, fidx, mnemonic):
+        # NOTE: wassail offsets and decoded positions may number the instructions differently (e.g. block ends),
+        # but both keep the order of the instructions, the k-th match of a mnemonic is its k-th occurrence in the body
+        key = (fidx, mnemonic)
+        if key not in self.positions:
+            self.positions[key] = None
+            instructions = self.bodies.get(fidx) if self.bodies is not None else None
+            if instructions is not None:
+                offsets = sorted(self.match_offsets[key])
+                decoded = decoded_mnemonic(mnemonic)
+                positions = [idx for idx, instruction in enumerate(instructions) if instruction.op.mnemonic == decoded]
+                if len(offsets) == len(positions):
+                    self.positions[key] = dict(zip(offsets, positions))
+                else:
+                    logging.info(f"{mnemonic} matches of function {fidx} do not line up with its decoded body, skipping its control flow check")
+        return self.positions[key]
+
+    def _position(self, rule_match):
+        positions = self._instruction_positions(rule_match.fidx, rule_match.rule.target_instruction)
+        return positions.get(rule_match.offset) if positions is not None else None
+
+    def _reachable(self, fidx, src, dst):
+        key = (fidx, src, dst)
+        if key not in self.reachability:
+            if fidx not in self.control_flows:
+                self.control_flows[fidx] = build_control_flow(self.bodies[fidx])
+            self.reachability[key] = is_reachable(self.control_flows[fidx], src, dst)
+        return self.reachability[key]
+
+    def keep(self, match_sequence):
+        """Check that every match of a sequence can be executed, in order, from the entry of its function."""
+        previous = None
+        for rule_match in match_sequence:
+            position = self._position(rule_match)
+            if position is None:
+                return True
+            # NOTE: the first match must be reachable from the entry of the function, the others from the previous match,
+            # except in recursive functions where a nested invocation can execute the next match wherever it is in the body
+            if previous is None or rule_match.fidx in self.recursive_functions:
+                reachable = position == 0 or self._reachable(rule_match.fidx, 0, position)
+            else:
+                reachable = self._reachable(rule_match.fidx, previous, position)
+            if not reachable:
+                self.pruned["unreachable offsets"] += 1
+                return False
+            previous = position
+        return True
@@ -1,8 +1,11 @@
 from lark import Lark, Transformer, v_args
+import ast
 import os
 # Reusing your grammar
 file_path = os.path.join(os.path.dirname(__file__), 'rule_grammar.lark')
 rule_grammar = open(file_path).read()
+# NOTE: (rule name, parameters, condition) -> compiled constraint, every unpickled task of a worker reuses the functions compiled by the first one
+_compiled_constraints = {}
 
 # Model classes
 class RuleMatch():
@@ -14,12 +17,29 @@ class RuleMatch():
     def __str__(self):
         return f"______ {self.rule.name} ______\nfunction: {self.fidx}\noffset: {self.offset}\ninstruction:{self.rule.target_instruction}"
 
+class ConstraintBuilder():
+    """A rule constraint compiled once into a function that takes the instruction operands and returns the constraint expression."""
+    def __init__(self, rule_name, parameters, condition):
+        self.rule_name = rule_name
+        self.parameters = list(parameters)
+        self.condition = condition
+        key = (rule_name, tuple(self.parameters), condition)
+        if key not in _compiled_constraints:
+            _compiled_constraints[key] = compile_constraint(rule_name, self.parameters, condition)
+        self._build = _compiled_constraints[key]
+    def __call__(self, *operands):
+        return self._build(*operands)
+    def __reduce__(self):
+        # NOTE: compiled functions cannot be pickled, the worker processes compile them once and cache them
+        return (ConstraintBuilder, (self.rule_name, self.parameters, self.condition))
+
 class Rule():
     def __init__(self, name, target_instruction, parameters=None, constraints=None):
         self.name = name
         self.target_instruction = target_instruction
         self.parameters = parameters or []
         self.constraints = constraints or []
+        self.constraint_builders = [ConstraintBuilder(name, self.parameters, constraint) for constraint in self.constraints]
     def __str__(self):
         return f"______ {self.name} ______\ntarget instruction: {self.target_instruction}\nparameters: {self.parameters}\nconstraints: {self.constraints}"
 
@@ -43,6 +63,19 @@ class RuleSet():
         output += " > ".join(self.sequence)
         return output
 
+def compile_constraint(rule_name, parameters, condition):
+    """Compile a rule condition into a function of the rule parameters, reporting syntax errors and unknown names."""
+    try:
+        tree = ast.parse(condition, mode="eval")
+    except SyntaxError as e:
+        raise Exception(f"Invalid constraint in rule {rule_name}: {condition} ({e.msg})") from e
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in parameters:
+            raise Exception(f"Unknown parameter {node.id} in constraint of rule {rule_name}: {condition}")
+    source = f"lambda {', '.join(parameters)}: ({condition})"
+    # NOTE: operands are Manticore expressions, no builtin is needed to combine them
+    return eval(compile(source, f"<rule {rule_name}>", "eval"), {"__builtins__": {}})
+
 # Lark Transformer to convert tree to Rule/RuleSet
 class RuleTransformer(Transformer):
     def __init__(self):
@@ -58,7 +91,7 @@ class RuleTransformer(Transformer):
         self.rules.append(Rule(name, mnemonic, params, constraints))
 
     def rule_sequence_line(self, items):
-        self.sequence = [str(item).replace(" ", "") for item in items]
+        self.sequence = [str(item).replace(" ", "") for item in items if item.type == "RULE_NAME"]
 
     def param_name(self, items):
         return str(items[0]).replace(" ","")  # Token
@@ -75,12 +108,12 @@ class RuleTransformer(Transformer):
     def start(self, _):
         return RuleSet(self.rules, self.sequence)
 
-rule_parser = Lark(rule_grammar, parser="lalr", lexer="contextual", transformer=RuleTransformer())
+rule_parser = Lark(rule_grammar, parser="lalr", lexer="contextual")
 def parse_rule_file(path):
-    # Parser setup
+    # NOTE: the transformer collects the rules of a single file, use a fresh one for every parse
     with open(path, 'r') as file:
         content = file.read()
-        ruleset = rule_parser.parse(content)
+        ruleset = RuleTransformer().transform(rule_parser.parse(content))
         return ruleset
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+import logging
+import z3
+
+# NOTE: a conjunct whose implication check does not finish in time is kept, the snapshot stays equivalent either way
+IMPLIED_CHECK_TIMEOUT_MS = 200
+
+def find_implied_assertions(declarations, assertions):
+    """Return the indexes of the SMT-LIB assertions implied by the other ones that are kept, checked in order, so that dropping them leaves an equivalent set."""
+    try:
+        parsed = z3.parse_smt2_string("\n".join(declarations) + "\n" + "\n".join(f"(assert {assertion})" for assertion in assertions))
+    except z3.Z3Exception as e:
+        logging.debug(f"could not parse constraints for the implication check, keeping them all: {e}")
+        return set()
+    if len(parsed) != len(assertions):
+        return set()
+    solver = z3.Solver()
+    solver.set("timeout", IMPLIED_CHECK_TIMEOUT_MS)
+    # NOTE: every assertion is guarded by a literal, the same incremental solver then checks any subset through assumptions
+    enabled = [z3.Bool(f"__kept_{idx}") for idx in range(len(parsed))]
+    negated = [z3.Bool(f"__negated_{idx}") for idx in range(len(parsed))]
+    for idx, assertion in enumerate(parsed):
+        solver.add(z3.Implies(enabled[idx], assertion))
+        solver.add(z3.Implies(negated[idx], z3.Not(assertion)))
+    implied = set()
+    for idx in range(len(parsed)):
+        others = [enabled[other] for other in range(len(parsed)) if other != idx and other not in implied]
+        # NOTE: the others cannot hold while this one is false, it adds nothing to them
+        if solver.check(*others, negated[idx]) == z3.unsat:
+            implied.add(idx)
+    return implied
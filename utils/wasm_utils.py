@@ -0,0 +1,138 @@
+import logging
+import re
+import wasm
+
+# NOTE: external kind of the function imports, they come first in the function index space
+IMPORT_KIND_FUNCTION = 0
+# NOTE: the wasm package decodes the instructions with their pre-standard mnemonics, rules use the names of the specification
+DECODED_MNEMONICS = {
+    "local.get": "get_local",
+    "local.set": "set_local",
+    "local.tee": "tee_local",
+    "global.get": "get_global",
+    "global.set": "set_global",
+    "memory.size": "current_memory",
+    "memory.grow": "grow_memory",
+}
+# NOTE: conversions, e.g. i32.trunc_f64_s is decoded as i32.trunc_s/f64 and i32.wrap_i64 as i32.wrap/i64
+CONVERSION_MNEMONIC = re.compile(r"^([if](?:32|64)\.[a-z]+)_([if](?:32|64))(?:_([su]))?$")
+
+class FunctionFeatures():
+    """Cheap static features of a function body: instruction count, loops and direct calls"""
+    def __init__(self, instructions, loops, calls):
+        self.instructions = instructions
+        self.loops = loops
+        self.calls = calls
+
+def decode_function_bodies(module):
+    """Decode the code section of a WASM module and return the instructions of each defined function by function index."""
+    with open(module, "rb") as f:
+        data = f.read()
+    imported_functions = 0
+    bodies = {}
+    for _, section in wasm.decode_module(data):
+        section_id = getattr(section, "id", None)
+        if section_id == wasm.SEC_IMPORT:
+            imported_functions = sum(1 for entry in section.payload.entries if entry.kind == IMPORT_KIND_FUNCTION)
+        elif section_id == wasm.SEC_CODE:
+            for idx, body in enumerate(section.payload.bodies):
+                bodies[imported_functions + idx] = list(wasm.decode_bytecode(body.code))
+    return bodies
+
+def decoded_mnemonic(mnemonic):
+    """Return the mnemonic the wasm package decodes for an instruction named as in the WebAssembly specification."""
+    if mnemonic in DECODED_MNEMONICS:
+        return DECODED_MNEMONICS[mnemonic]
+    conversion = CONVERSION_MNEMONIC.match(mnemonic)
+    if conversion is None:
+        return mnemonic
+    name, source, sign = conversion.groups()
+    return f"{name}_{sign}/{source}" if sign else f"{name}/{source}"
+
+def load_function_bodies(module):
+    """Return the decoded function bodies of a module, or None if it cannot be decoded, the static analyses then fall back to conservative answers."""
+    try:
+        return decode_function_bodies(module)
+    except Exception as e:
+        logging.warning(f"could not decode the function bodies of {module}, static analyses are unavailable: {e}")
+        return None
+
+def get_function_features(bodies):
+    """Return the FunctionFeatures of each decoded function body."""
+    features = {}
+    for fidx, instructions in (bodies or {}).items():
+        loops = sum(1 for instruction in instructions if instruction.op.id == wasm.OP_LOOP)
+        calls = sum(1 for instruction in instructions if instruction.op.id in (wasm.OP_CALL, wasm.OP_CALL_INDIRECT))
+        features[fidx] = FunctionFeatures(len(instructions), loops, calls)
+    return features
+
+def match_block_ends(instructions):
+    """Return, for every block, loop and if instruction, the index of its matching else (or None) and end instructions."""
+    ends = {}
+    stack = []
+    for idx, instruction in enumerate(instructions):
+        op = instruction.op.id
+        if op in (wasm.OP_BLOCK, wasm.OP_LOOP, wasm.OP_IF):
+            stack.append([idx, None])
+        elif op == wasm.OP_ELSE:
+            stack[-1][1] = idx
+        elif op == wasm.OP_END and stack:
+            start, else_idx = stack.pop()
+            ends[start] = (else_idx, idx)
+    return ends
+
+def build_control_flow(instructions):
+    """Return the successors of every instruction of a function body, following the structured control flow of WebAssembly."""
+    ends = match_block_ends(instructions)
+    successors = []
+    # NOTE: enclosing constructs as (opcode, index of the construct, index of its end)
+    stack = []
+    size = len(instructions)
+
+    def branch_target(depth):
+        # NOTE: a branch to a loop restarts it, a branch to a block or an if leaves it, a branch past the outermost construct returns
+        if depth >= len(stack):
+            return None
+        op, start, end = stack[-1 - depth]
+        return start + 1 if op == wasm.OP_LOOP else end + 1
+
+    for idx, instruction in enumerate(instructions):
+        op = instruction.op.id
+        following = [idx + 1] if idx + 1 < size else []
+        if op in (wasm.OP_BLOCK, wasm.OP_LOOP, wasm.OP_IF):
+            else_idx, end = ends.get(idx, (None, size - 1))
+            stack.append((op, idx, end))
+            if op == wasm.OP_IF:
+                # NOTE: a false condition jumps to the else branch, or past the end if there is none
+                following = following + [else_idx + 1 if else_idx is not None else end + 1]
+        elif op == wasm.OP_ELSE:
+            # NOTE: the end of the then branch skips the else branch
+            following = [stack[-1][2] + 1]
+        elif op == wasm.OP_END:
+            if stack:
+                stack.pop()
+        elif op == wasm.OP_BR:
+            following = [branch_target(instruction.imm.relative_depth)]
+        elif op == wasm.OP_BR_IF:
+            following = following + [branch_target(instruction.imm.relative_depth)]
+        elif op == wasm.OP_BR_TABLE:
+            depths = list(instruction.imm.target_table) + [instruction.imm.default_target]
+            following = [branch_target(depth) for depth in depths]
+        elif op in (wasm.OP_RETURN, wasm.OP_UNREACHABLE):
+            following = []
+        successors.append(sorted(set(target for target in following if target is not None and target < size)))
+    return successors
+
+def is_reachable(successors, src, dst):
+    """Check if the instruction at index dst can be executed after the one at index src."""
+    visited = set()
+    stack = list(successors[src])
+    while stack:
+        idx = stack.pop()
+        if idx == dst:
+            return True
+        if idx in visited:
+            continue
+        visited.add(idx)
+        stack.extend(successors[idx])
+    return False
@@ -1,11 +1,14 @@
 from utils.rule_parser_lark import RuleMatch
-from utils.dot_file_utils import load_dot_file
+from utils.dot_file_utils import parse_dot_edges
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import os
 import subprocess
+import tempfile
 
 def parse_wassail_output(output, rule_set):
     """Parse the output of Wassail for a given RuleSet and return a dictionary mapping rule IDs to lists of RuleMatch objects."""
-    matches = output.stdout.decode('utf-8').strip().split("\n")
+    matches = output.strip().split("\n")
     rule_matches = defaultdict(list)
     for match in matches:
         if len(match) > 1:
@@ -19,34 +22,75 @@ def parse_wassail_output(output, rule_set):
             matched_rule = rule_set.rules[rule_id] 
             rule_matches[rule_id].append(RuleMatch(matched_rule, fidx, offset))
     return rule_matches
-    
+
+def parse_exports_output(output):
+    """Parse the output of Wassail exports and return the exported nodes as a list of node names."""
+    exported_nodes = []
+    for line in output.split("\n")[:-1]:
+        exported_nodes.append("node"+line.split("\t")[0])
+    return exported_nodes
+
+def call_wassail(*args):
+    """Run Wassail with the given arguments, raise an exception if it fails, and return its standard output and standard error."""
+    output = subprocess.run(["wassail", *args], capture_output=True)
+    stderr = output.stderr.decode('utf-8')
+    if output.returncode != 0:
+        raise Exception(f"wassail {' '.join(args)} failed with exit status {output.returncode}:\n{stderr}")
+    if len(stderr) > 0:
+        print(f"[WARNING]: unexpected output from wassail:\n{stderr}", flush=True)
+    return output.stdout.decode('utf-8'), stderr
+
+def run_wassail(*args):
+    """Run Wassail with the given arguments and return its standard output."""
+    return call_wassail(*args)[0]
+
+def get_rule_instructions(rule_set):
+    """Return the comma separated target instructions of a RuleSet, as expected by wassail apply-rule."""
+    return ",".join(rule.target_instruction for rule in rule_set.rules)
+
 def get_rule_matches(rule_set, module):
     """Run Wassail to apply rules on a module and return the parsed rule matches."""
-    wassail_input = ""
-    for rule in rule_set.rules:
-        wassail_input = wassail_input +  rule.target_instruction + ","
-    wassail_input = wassail_input[:-1]
-    output = subprocess.run(["wassail","apply-rule", module, wassail_input], capture_output=True)
-    if len(output.stderr) > 0:
-        print(f"[WARNING]: unexpected output from wassail:\n{output.stderr.decode('utf-8')}", flush=True)
+    output = run_wassail("apply-rule", module, get_rule_instructions(rule_set))
     # NOTE: parse found matches from wassail
     rule_matches = parse_wassail_output(output, rule_set)
     return rule_matches
 
 def get_exported_nodes(module):
     """Run Wassail to get exported nodes from a module and return them as a list of node names."""
-    output = subprocess.run(["wassail","exports",module], capture_output=True)
-    if len(output.stderr) > 0:
-        print(f"[WARNING]: unexpected output from wassail:\n{output.stderr.decode('utf-8')}", flush=True)
-    exported_nodes = []
-    for line in output.stdout.decode('utf-8').split("\n")[:-1]:
-        exported_nodes.append("node"+line.split("\t")[0])
-    return exported_nodes
+    return parse_exports_output(run_wassail("exports", module))
+
+def call_callgraph(module):
+    """Run Wassail to generate a callgraph for a module in a private temporary file and return its (src, dst) edges and the standard error of Wassail."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dot_path = os.path.join(tmp_dir, "callgraph.dot")
+        _, stderr = call_wassail("callgraph", module, dot_path)
+        with open(dot_path) as f:
+            return parse_dot_edges(f), stderr
 
 def get_callgraph(module):
-    """Run Wassail to generate a callgraph for a module, load it from a DOT file, and return the graph object."""
-    output = subprocess.run(["wassail","callgraph", module, "callgraph.dot"], capture_output=True)
-    if len(output.stderr) > 0:
-        print(f"[WARNING]: unexpected output from wassail:\n{output.stderr.decode('utf-8')}", flush=True)
-    cfg = load_dot_file("callgraph.dot")
-    return cfg
\ No newline at end of file
+    """Run Wassail to generate a callgraph for a module and return its (src, dst) edges."""
+    return call_callgraph(module)[0]
+
+def _cached(cache, module_hash, fingerprint, compute):
+    # NOTE: compute returns (value, stderr), a failed run raises and an output with warnings is not cached, both are retried by the next run
+    if cache is None:
+        return compute()[0]
+    key = cache.key(module_hash, None, ("wassail",) + fingerprint)
+    hit, value = cache.get(key)
+    if not hit:
+        value, stderr = compute()
+        if len(stderr) == 0:
+            cache.put(key, value)
+    return value
+
+def run_front_end(rule_set, module, cache=None, module_hash=None):
+    """Run the three Wassail analyses of a module concurrently, reusing cached outputs, and return (rule_matches, exported_nodes, callgraph edges)."""
+    rule_instructions = get_rule_instructions(rule_set)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        matches_future = executor.submit(_cached, cache, module_hash, ("apply-rule", rule_instructions), lambda: call_wassail("apply-rule", module, rule_instructions))
+        exports_future = executor.submit(_cached, cache, module_hash, ("exports",), lambda: call_wassail("exports", module))
+        callgraph_future = executor.submit(_cached, cache, module_hash, ("callgraph",), lambda: call_callgraph(module))
+        rule_matches = parse_wassail_output(matches_future.result(), rule_set)
+        exported_nodes = parse_exports_output(exports_future.result())
+        callgraph = callgraph_future.result()
+    return rule_matches, exported_nodes, callgraph